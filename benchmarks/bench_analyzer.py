@@ -0,0 +1,173 @@
+"""
+Offline benchmark of the analyzer against the local API stand-in.
+
+    python benchmarks/bench_analyzer.py
+    python benchmarks/bench_analyzer.py --sizes 1,10 --latency 0.05 --failure-rate 0.05 --json out.json
+
+For each batch size it reports wall-clock time, request count and bytes sent/
+received for analyze_pdf_with_openai (once per PDF), analyze_multiple_pdfs
+(all PDFs at once) and chat_with_openai (one turn on the comparison thread).
+Every batch size starts with empty caches in a temporary directory, and
+the upload cache is cleared before each function so all three start cold.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_openai import FakeOpenAI
+
+PAGE_TEXTS = [
+    "Annual Report {year}. Letter to shareholders. Our strategy and outlook.",
+    "Consolidated Income Statement {year}. Revenue 1,200 Cost of revenue 700 Gross profit 500 "
+    "Operating income 300 Net income 210 Earnings per share diluted 2.10",
+    "Consolidated Balance Sheet {year}. Total assets 5,000 Total liabilities 3,000 "
+    "Total equity 2,000 Cash and cash equivalents 400",
+    "Consolidated Statement of Cash Flows {year}. Net cash from operating activities 350 "
+    "Capital expenditure 120 Free cash flow 230",
+    "Corporate governance and remuneration report {year}. Board of directors.",
+]
+
+def make_pdf(path: str, texts: list[str]):
+    """Write a minimal text PDF (one Helvetica line per page) without extra dependencies."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        stream = f"BT /F1 10 Tf 40 750 Td ({escaped}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_pdfs(directory: str, n: int) -> list[str]:
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(n):
+        path = os.path.join(directory, f"company_{i:03d}_annual_report.pdf")
+        year = 2015 + i % 10
+        make_pdf(path, [t.format(year=year) + f" Company {i}." for t in PAGE_TEXTS])
+        paths.append(path)
+    return paths
+
+def measure(fake: FakeOpenAI, fn) -> dict:
+    fake.reset_stats()
+    started = time.perf_counter()
+    error = None
+    try:
+        fn()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - started
+    stats = fake.stats()
+    return {
+        "wall_s": round(wall, 3),
+        "requests": stats["requests"],
+        "bytes_sent": stats["bytes_sent"],
+        "bytes_received": stats["bytes_received"],
+        "injected_failures": stats["failures"],
+        "error": error,
+    }
+
+def run_size(n: int, args, fake: FakeOpenAI) -> list[dict]:
+    work = tempfile.mkdtemp(prefix=f"bench_{n}_")
+    try:
+        from ui.config import config
+        config.cache_dir = os.path.join(work, "cache")
+        config.api_base_url = fake.base_url
+        config.use_streaming = not args.no_streaming
+        config.use_page_filter = not args.no_page_filter
+        config.use_upload_cache = not args.no_upload_cache
+
+        # Singletons bind their paths at import; import fresh per size
+        for name in [m for m in sys.modules if m == "ui" or m.startswith("ui.")]:
+            if name != "ui.config":
+                del sys.modules[name]
+        from ui import analyzer
+        from ui.client_manager import client_manager
+
+        pdfs = make_pdfs(os.path.join(work, "pdfs"), n)
+        rows = []
+        thread = {}
+
+        def singles():
+            for p in pdfs:
+                analyzer.analyze_pdf_with_openai(p, "sk-bench", "asst_bench")
+
+        def multiple():
+            thread["id"] = analyzer.analyze_multiple_pdfs(pdfs, "sk-bench", "asst_bench")[1]
+
+        def chat():
+            analyzer.chat_with_openai("sk-bench", "asst_bench", "Which company grew fastest?",
+                                      thread_id=thread.get("id"))
+
+        for name, fn in (("analyze_pdf_with_openai", singles),
+                         ("analyze_multiple_pdfs", multiple),
+                         ("chat_with_openai", chat)):
+            analyzer.upload_cache.clear()
+            rows.append(dict(function=name, pdfs=n, **measure(fake, fn)))
+        client_manager.close_all()
+        return rows
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer against a local API stand-in.")
+    parser.add_argument("--sizes", default="1,10,50", help="comma-separated PDF counts")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    parser.add_argument("--run-seconds", type=float, default=0.2, help="time each run takes")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--fail-status", type=int, default=500)
+    parser.add_argument("--no-streaming", action="store_true")
+    parser.add_argument("--no-page-filter", action="store_true")
+    parser.add_argument("--no-upload-cache", action="store_true")
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args(argv)
+
+    fake = FakeOpenAI(latency=args.latency, run_seconds=args.run_seconds,
+                      failure_rate=args.failure_rate, fail_status=args.fail_status)
+    fake.start()
+    rows = []
+    try:
+        for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            rows.extend(run_size(n, args, fake))
+    finally:
+        fake.stop()
+
+    header = f"{'function':<26}{'pdfs':>5}{'wall s':>9}{'requests':>10}{'sent KB':>10}{'recv KB':>10}  error"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['function']:<26}{r['pdfs']:>5}{r['wall_s']:>9.2f}{r['requests']:>10}"
+              f"{r['bytes_sent'] / 1024:>10.1f}{r['bytes_received'] / 1024:>10.1f}  {r['error'] or ''}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 1 if any(r["error"] for r in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""
+Offline stand-in for the OpenAI Files, Threads, Messages and Runs endpoints
+used by ui/analyzer.py, served over local HTTP so the real client stack
+(connection pool, rate governor, streaming parser) is exercised.
+
+    fake = FakeOpenAI(latency=0.02, run_seconds=0.3, failure_rate=0.05)
+    fake.start()
+    config.api_base_url = fake.base_url
+    ...
+    print(fake.stats())
+    fake.stop()
+"""
+import re
+import json
+import time
+import random
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_REPLY = (
+    "```\n"
+    "| Metric | {periods} |\n"
+    "| --- | {rules} |\n"
+    "| Revenue | {values} |\n"
+    "| Net Income | {values} |\n"
+    "```\n\n"
+    "Key Insights\n"
+    "- Stand-in analysis of {n} attached file(s).\n"
+)
+
+class FakeOpenAI:
+    """
+    latency       seconds added to every request
+    run_seconds   time a run spends queued/in_progress before completing
+    failure_rate  share of requests answered with fail_status instead
+    fail_status   HTTP status for injected failures (429 carries retry-after-ms)
+    script        replies to hand out in order: strings, or dicts such as
+                  {"status": "failed", "code": "rate_limit_exceeded"} or
+                  {"status": "incomplete", "reason": "max_tokens", "text": "..."};
+                  once exhausted, DEFAULT_REPLY is used
+    """
+    def __init__(self, latency: float = 0.0, run_seconds: float = 0.2, failure_rate: float = 0.0,
+                 fail_status: int = 500, script=None, seed: int = 0, rpm: int = 5000, tpm: int = 2000000):
+        self.latency = latency
+        self.run_seconds = run_seconds
+        self.failure_rate = failure_rate
+        self.fail_status = fail_status
+        self.script = list(script or [])
+        self.rpm, self.tpm = rpm, tpm
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.files, self.threads = {}, {}
+        self.server = None
+        self.reset_stats()
+
+    # Lifecycle
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        handler = type("BoundFakeHandler", (_Handler,), {"fake": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # Accounting
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "bytes_sent": 0, "bytes_received": 0, "failures": 0, "endpoints": {}}
+
+    def stats(self) -> dict:
+        """Counts from the client's point of view: bytes_sent is what the client uploaded."""
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def _count(self, endpoint: str, sent: int = 0, received: int = 0, failed: bool = False):
+        with self._lock:
+            s = self._stats
+            s["requests"] += 1 if endpoint else 0
+            s["bytes_sent"] += sent
+            s["bytes_received"] += received
+            s["failures"] += 1 if failed else 0
+            if endpoint:
+                s["endpoints"][endpoint] = s["endpoints"].get(endpoint, 0) + 1
+
+    # Objects
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):06d}"
+
+    def _message(self, thread_id: str, role: str, text: str, attachments=None, run_id=None) -> dict:
+        return {
+            "id": self._id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "status": "completed", "run_id": run_id,
+            "assistant_id": None, "metadata": {}, "attachments": attachments or [],
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        }
+
+    def _next_reply(self, thread: dict):
+        if self.script:
+            item = self.script.pop(0)
+            return item if isinstance(item, dict) else {"text": item}
+        files = {a["file_id"] for m in thread["messages"] for a in m["attachments"]}
+        n = max(len(files), 1)
+        periods = " | ".join(f"FY{2020 + i}" for i in range(min(n, 4)))
+        cols = min(n, 4)
+        text = DEFAULT_REPLY.format(
+            periods=periods, rules=" | ".join(["---"] * cols), values=" | ".join(["100"] * cols), n=len(files)
+        )
+        return {"text": text}
+
+    def _run_view(self, run: dict) -> dict:
+        """Advance a run by wall-clock time and return its public object."""
+        elapsed = time.monotonic() - run["_started"]
+        if run["status"] in ("queued", "in_progress"):
+            if elapsed >= self.run_seconds:
+                self._finish_run(run)
+            elif elapsed >= self.run_seconds * 0.2:
+                run["status"] = "in_progress"
+        return {k: v for k, v in run.items() if not k.startswith("_")}
+
+    def _finish_run(self, run: dict):
+        reply = run["_reply"]
+        status = reply.get("status", "completed")
+        if status in ("completed", "incomplete"):
+            thread = self.threads[run["thread_id"]]
+            thread["messages"].append(self._message(run["thread_id"], "assistant", reply.get("text", ""), run_id=run["id"]))
+            prompt = sum(len(m["content"][0]["text"]["value"]) for m in thread["messages"]) // 4
+            completion = len(reply.get("text", "")) // 4
+            run["usage"] = {"prompt_tokens": prompt, "completion_tokens": completion,
+                            "total_tokens": prompt + completion}
+        if status == "incomplete":
+            run["incomplete_details"] = {"reason": reply.get("reason", "max_tokens")}
+        if status == "failed":
+            run["last_error"] = {"code": reply.get("code", "server_error"), "message": "Injected failure"}
+        run["status"] = status
+        run["completed_at"] = int(time.time())
+
+    def _create_run(self, thread_id: str, body: dict) -> dict:
+        run = {
+            "id": self._id("run"), "object": "thread.run", "created_at": int(time.time()),
+            "thread_id": thread_id, "assistant_id": body.get("assistant_id"), "status": "queued",
+            "model": body.get("model") or "fake-model", "instructions": body.get("instructions") or "",
+            "tools": [], "metadata": {}, "last_error": None, "incomplete_details": None, "usage": None,
+            "truncation_strategy": body.get("truncation_strategy"),
+            "_started": time.monotonic(), "_reply": self._next_reply(self.threads[thread_id]),
+        }
+        self.threads[thread_id]["runs"][run["id"]] = run
+        return run
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _request_size(self, body: bytes) -> int:
+        return len(self.requestline) + len(str(self.headers)) + len(body)
+
+    def _headers(self):
+        self.send_header("x-ratelimit-limit-requests", str(self.fake.rpm))
+        self.send_header("x-ratelimit-remaining-requests", str(self.fake.rpm - 1))
+        self.send_header("x-ratelimit-reset-requests", "60ms")
+        self.send_header("x-ratelimit-limit-tokens", str(self.fake.tpm))
+        self.send_header("x-ratelimit-remaining-tokens", str(self.fake.tpm - 1000))
+        self.send_header("x-ratelimit-reset-tokens", "30ms")
+
+    def _json(self, code: int, payload: dict, endpoint: str, body: bytes):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self._headers()
+        if code == 429:
+            self.send_header("retry-after-ms", "50")
+        self.end_headers()
+        self.wfile.write(data)
+        self.fake._count(endpoint, self._request_size(body), len(data), failed=code >= 400)
+
+    def _handle(self, method: str):
+        fake = self.fake
+        body = self._read_body()
+        url = urlparse(self.path)
+        path = re.sub(r"^/v1", "", url.path)
+        endpoint = f"{method} " + re.sub(r"/(file|thread|run|msg)_\w+", r"/{\1}", path)
+        if fake.latency:
+            time.sleep(fake.latency)
+        if fake.failure_rate and fake._random.random() < fake.failure_rate:
+            return self._json(fake.fail_status, {"error": {"message": "Injected failure"}}, endpoint, body)
+        try:
+            result = self._route(method, path, parse_qs(url.query), body)
+        except KeyError:
+            return self._json(404, {"error": {"message": "No such object"}}, endpoint, body)
+        if result is None:  # streamed
+            return
+        self._json(200, result, endpoint, body)
+
+    def _route(self, method, path, query, body):
+        fake = self.fake
+        parts = path.strip("/").split("/")
+        with fake._lock:
+            if parts == ["files"] and method == "POST":
+                m = re.search(rb'filename="([^"]*)"', body)
+                f = {"id": fake._id("file"), "object": "file", "bytes": len(body), "created_at": int(time.time()),
+                     "filename": m.group(1).decode() if m else "upload.pdf", "purpose": "assistants",
+                     "status": "processed", "expires_at": None}
+                fake.files[f["id"]] = f
+                return f
+            if parts[0] == "files" and len(parts) == 2:
+                if method == "DELETE":
+                    fake.files.pop(parts[1])
+                    return {"id": parts[1], "object": "file", "deleted": True}
+                return fake.files[parts[1]]
+            if parts == ["threads"] and method == "POST":
+                t = {"id": fake._id("thread"), "object": "thread", "created_at": int(time.time()),
+                     "metadata": {}, "tool_resources": {"file_search": {"vector_store_ids": []}}}
+                fake.threads[t["id"]] = dict(t, messages=[], runs={})
+                return t
+            thread = fake.threads[parts[1]]
+            view = {k: v for k, v in thread.items() if k not in ("messages", "runs")}
+            if len(parts) == 2:
+                if method == "DELETE":
+                    del fake.threads[parts[1]]
+                    return {"id": parts[1], "object": "thread.deleted", "deleted": True}
+                return view
+            if parts[2] == "messages":
+                if method == "POST":
+                    data = json.loads(body or b"{}")
+                    content = data.get("content")
+                    if isinstance(content, list):
+                        content = "".join(c.get("text", "") for c in content)
+                    msg = fake._message(parts[1], data.get("role", "user"), content or "", data.get("attachments"))
+                    thread["messages"].append(msg)
+                    return msg
+                return self._list_messages(thread, query)
+            if parts[2] == "runs":
+                if len(parts) == 3:
+                    data = json.loads(body or b"{}")
+                    run = fake._create_run(parts[1], data)
+                    if data.get("stream"):
+                        stream_run = run
+                    else:
+                        return fake._run_view(run)
+                else:
+                    run = thread["runs"][parts[3]]
+                    if len(parts) == 5 and parts[4] == "cancel":
+                        if run["status"] in ("queued", "in_progress"):
+                            run["status"] = "cancelled"
+                    return fake._run_view(run)
+        # Streaming happens outside the lock
+        self._stream(stream_run, body)
+        return None
+
+    def _list_messages(self, thread, query):
+        order = query.get("order", ["desc"])[0]
+        limit = int(query.get("limit", ["20"])[0])
+        after = query.get("after", [None])[0]
+        messages = list(thread["messages"]) if order == "asc" else list(reversed(thread["messages"]))
+        if after:
+            ids = [m["id"] for m in messages]
+            messages = messages[ids.index(after) + 1:] if after in ids else []
+        page = messages[:limit]
+        return {"object": "list", "data": page, "has_more": len(messages) > limit,
+                "first_id": page[0]["id"] if page else None, "last_id": page[-1]["id"] if page else None}
+
+    def _stream(self, run: dict, body: bytes):
+        fake = self.fake
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self._headers()
+        self.end_headers()
+        sent = 0
+
+        def event(name, payload):
+            nonlocal sent
+            chunk = f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode()
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            sent += len(chunk)
+
+        public = lambda: {k: v for k, v in run.items() if not k.startswith("_")}
+        event("thread.run.created", public())
+        run["status"] = "in_progress"
+        event("thread.run.in_progress", public())
+        reply = run["_reply"]
+        text = reply.get("text", "")
+        msg_id = fake._id("msg")
+        if reply.get("status", "completed") in ("completed", "incomplete"):
+            pending = fake._message(run["thread_id"], "assistant", "", run_id=run["id"])
+            pending.update(id=msg_id, status="in_progress", content=[])
+            event("thread.message.created", pending)
+            words = re.findall(r"\S+\s*|\s+", text) or [""]
+            pause = fake.run_seconds / max(len(words), 1)
+            for i, word in enumerate(words):
+                if run["status"] == "cancelled":
+                    break
+                time.sleep(pause)
+                event("thread.message.delta", {"id": msg_id, "object": "thread.message.delta", "delta": {
+                    "content": [{"index": 0, "type": "text", "text": {"value": word, "annotations": []}}]
+                }})
+        else:
+            until = time.monotonic() + fake.run_seconds
+            while run["status"] != "cancelled" and time.monotonic() < until:
+                time.sleep(0.05)
+        with fake._lock:
+            if run["status"] != "cancelled":
+                fake._finish_run(run)
+            done = public()
+        if done["status"] in ("completed", "incomplete"):
+            final = fake.threads[run["thread_id"]]["messages"][-1]
+            final["id"] = msg_id
+            event("thread.message.completed", final)
+        event(f"thread.run.{done['status']}", done)
+        chunk = b"event: done\ndata: [DONE]\n\n"
+        self.wfile.write(chunk)
+        self.wfile.flush()
+        self.close_connection = True
+        fake._count("POST /threads/{thread}/runs (stream)", self._request_size(body), sent + len(chunk))
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
@@ -0,0 +1,193 @@
+"""
+Headless batch analysis, e.g. for overnight runs on a server without a display.
+
+    python cli.py reports/ "filings/*.pdf" --mode both --workers 4 --out results/
+    python cli.py downloads/ --watch   # analyze new PDFs as they arrive, until Ctrl-C
+
+Exit status: 0 if every analysis succeeded, 1 if any failed, 2 on usage
+errors (no PDFs, missing credentials), 130 if interrupted.
+Only non-GUI modules of the ui package are imported.
+"""
+import os
+import sys
+import glob
+import time
+import queue
+import argparse
+
+from ui.config import config
+from ui.batch import run_analysis, write_result
+from ui.client_manager import get_client, client_manager
+from ui.lifecycle import resource_tracker
+from ui.watcher import FolderWatcher
+from ui.jobs import scheduler
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED = 0, 1, 2, 130
+
+def collect_pdfs(inputs: list[str]) -> list[str]:
+    """Expand directories (recursively) and glob patterns into a sorted list of PDFs."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)
+            matches += glob.glob(os.path.join(item, "**", "*.PDF"), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True)
+        found.update(os.path.abspath(p) for p in matches if p.lower().endswith(".pdf") and os.path.isfile(p))
+    return sorted(found)
+
+def output_name(path: str, pdfs: list[str]) -> str:
+    """
+    Result name for path: its path relative to the folder common to all
+    pdfs, so same-named files in different subfolders don't overwrite
+    each other (annual/report.pdf -> annual__report).
+    """
+    root = os.path.commonpath([os.path.dirname(p) for p in pdfs])
+    return os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "__")
+
+def _log(msg: str):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
+
+def run_jobs(tasks: dict, workers: int):
+    """
+    Run {key: fn} as scheduler jobs, at most workers at a time, and yield
+    (key, result) as they finish. On Ctrl-C every job is cancelled (queued
+    ones never start, running ones cancel their API runs) without waiting.
+    """
+    finished = queue.Queue()
+    # Worker threads are started on the first submit and never shrink
+    scheduler.workers = max(1, workers)
+    jobs = {}
+    # A job can finish before submit() returns its id, so filter on the way out
+    listener = lambda job: job.state in ("done", "failed", "cancelled") and finished.put(job)
+    scheduler.add_listener(listener)
+    try:
+        for key, fn in tasks.items():
+            job = scheduler.submit(fn, name=str(key))
+            jobs[job.id] = key
+        remaining = len(jobs)
+        while remaining:
+            try:
+                job = finished.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if job.id not in jobs:
+                continue
+            remaining -= 1
+            if job.state == "failed":
+                raise job.error
+            yield jobs[job.id], job.result
+    except KeyboardInterrupt:
+        for job_id in jobs:
+            scheduler.cancel(job_id)
+        raise
+    finally:
+        scheduler.remove_listener(listener)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Analyze financial PDFs without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    parser.add_argument("--mode", choices=("single", "compare", "both"), default="both",
+                        help="per-file analyses, one comparative analysis, or both (default)")
+    parser.add_argument("--workers", type=int, default=config.job_workers,
+                        help="single analyses to run in parallel")
+    parser.add_argument("--out", default="analysis_results", help="output directory")
+    parser.add_argument("--format", default="json,md", help="comma-separated: json, md")
+    parser.add_argument("--analysis-mode", choices=("file_search", "local", "map_reduce", "structured"),
+                        help="override config.analysis_mode for the comparative analysis")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY") or config.api_key)
+    parser.add_argument("--assistant-id", default=os.environ.get("OPENAI_ASSISTANT_ID") or config.assistant_id)
+    parser.add_argument("--force", action="store_true", help="ignore cached results")
+    parser.add_argument("--watch", action="store_true",
+                        help="watch the given directories and analyze new PDFs next to them")
+    parser.add_argument("--gc", action="store_true",
+                        help="delete API resources past the retention policy before running")
+    return parser
+
+def watch(args) -> int:
+    """Run folder watchers on the input directories until interrupted."""
+    dirs = [d for d in args.inputs if os.path.isdir(d)]
+    if not dirs:
+        _log("--watch needs at least one existing directory")
+        return EXIT_USAGE
+    watchers = []
+    for d in dirs:
+        w = FolderWatcher(d, args.api_key, args.assistant_id,
+                          on_event=lambda kind, path, detail: _log(f"{kind}: {path} {detail}".rstrip()))
+        w.start()
+        watchers.append(w)
+    _log(f"Watching {', '.join(dirs)} every {config.watch_interval}s (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        _log("Stopping")
+    finally:
+        for w in watchers:
+            w.stop()
+        client_manager.close_all()
+    return EXIT_OK
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+
+    if not (args.api_key and args.assistant_id):
+        _log("An API key (--api-key or OPENAI_API_KEY) and assistant ID are required")
+        return EXIT_USAGE
+    if args.watch:
+        return watch(args)
+    pdfs = collect_pdfs(args.inputs)
+    if not pdfs:
+        _log("No PDF files matched the given inputs")
+        return EXIT_USAGE
+    if args.analysis_mode:
+        config.analysis_mode = args.analysis_mode
+    _log(f"{len(pdfs)} PDF(s) found")
+
+    try:
+        if args.gc:
+            counts = resource_tracker.gc(get_client(args.api_key))
+            _log(f"Clean-up: {counts}")
+
+        results = []
+        if args.mode in ("single", "both"):
+            tasks = {
+                p: (lambda p=p: run_analysis("single", [p], args.api_key, args.assistant_id, args.force))
+                for p in pdfs
+            }
+            for path, result in run_jobs(tasks, max(1, args.workers)):
+                name = output_name(path, pdfs)
+                write_result(args.out, name, result, formats)
+                _log(f"{name}: {result['error'] or 'ok'} ({result['seconds']}s)")
+                results.append(result)
+        if args.mode in ("compare", "both") and len(pdfs) > 1:
+            compare = lambda: run_analysis(
+                "comparative", pdfs, args.api_key, args.assistant_id, args.force,
+                on_progress=lambda p, status, done, total: _log(
+                    f"compare {done}/{total} {os.path.basename(p)}: {status}"
+                )
+            )
+            for _, result in run_jobs({"comparison": compare}, 1):
+                write_result(args.out, "comparison", result, formats)
+                _log(f"comparison: {result['error'] or 'ok'} ({result['seconds']}s)")
+                results.append(result)
+    except KeyboardInterrupt:
+        _log("Interrupted")
+        return EXIT_INTERRUPTED
+    finally:
+        client_manager.close_all()
+
+    failed = [r for r in results if r["error"]]
+    summary = {
+        "total": len(results),
+        "failed": len(failed),
+        "results": [{k: r[k] for k in ("kind", "files", "cached", "seconds", "error")} for r in results],
+    }
+    write_result(args.out, "summary", summary, ["json"])
+    _log(f"Done: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    return EXIT_FAILED if failed else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
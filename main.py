@@ -2,6 +2,7 @@ import os
 import tkinter as tk
 import ttkbootstrap as ttk
 from ui.main_app import MainApp
+from ui.client_manager import client_manager
 
 if __name__ == "__main__":
     app = ttk.Window(themename="superhero")
@@ -12,3 +13,4 @@ if __name__ == "__main__":
 
     MainApp(app)
     app.mainloop()
+    client_manager.close_all()
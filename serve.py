@@ -0,0 +1,51 @@
+"""
+Shared analysis service: one warm process (clients, caches, worker pool)
+for the whole team. Point the app at it via "Analysis Service URL" in Settings.
+
+    python serve.py --host 0.0.0.0 --port 8765 --token <shared secret>
+    python serve.py --stub            # offline, canned replies
+
+Only non-GUI modules of the ui package are imported.
+"""
+import os
+import sys
+import argparse
+
+from ui.config import config
+from ui.client_manager import client_manager
+from ui.service import AnalysisService, AnalyzerBackend, StubBackend, make_server
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve analyses over HTTP.")
+    parser.add_argument("--host", default=config.service_host)
+    parser.add_argument("--port", type=int, default=config.service_port)
+    parser.add_argument("--token", default=os.environ.get("ANALYSIS_SERVICE_TOKEN", config.service_token),
+                        help="require 'Authorization: Bearer <token>' on every request")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY") or config.api_key)
+    parser.add_argument("--assistant-id", default=os.environ.get("OPENAI_ASSISTANT_ID") or config.assistant_id)
+    parser.add_argument("--stub", action="store_true", help="use canned replies instead of the API")
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        backend = StubBackend(latency=args.stub_latency)
+    else:
+        if not (args.api_key and args.assistant_id):
+            print("An API key (--api-key or OPENAI_API_KEY) and assistant ID are required", file=sys.stderr)
+            return 2
+        config.api_key, config.assistant_id = args.api_key, args.assistant_id
+        backend = AnalyzerBackend()
+
+    server = make_server(AnalysisService(backend), args.host, args.port, args.token)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} ({type(backend).__name__})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        client_manager.close_all()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
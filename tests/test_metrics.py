@@ -0,0 +1,35 @@
+import math
+
+from ui.metrics import build_frame, render_table
+
+def _period(company, period, revenue, net_income):
+    return {"company": company, "period": period, "currency": "USD", "unit": "millions",
+            "revenue": revenue, "net_income": net_income}
+
+def test_single_company_keeps_period_labels():
+    df = build_frame([_period("A", "FY2023", 100, 10), _period("A", "FY2022", 80, 8)])
+    assert list(df.index) == ["FY2022", "FY2023"]
+    assert df.loc["FY2023", "revenue_growth"] == 25
+
+def test_companies_sharing_a_period_are_kept_apart():
+    df = build_frame([
+        _period("A", "FY2022", 80, 8),
+        _period("A", "FY2023", 100, 10),
+        _period("B", "FY2022", 400, 20),
+        _period("B", "FY2023", 2500, 50),
+    ])
+    assert list(df.index) == ["A FY2022", "A FY2023", "B FY2022", "B FY2023"]
+    assert df.loc["A FY2023", "revenue"] == 100
+    assert df.loc["A FY2023", "revenue_growth"] == 25
+    assert df.loc["B FY2023", "revenue_growth"] == 525
+    # The first period of each company has no earlier period to grow from
+    assert math.isnan(df.loc["B FY2022", "revenue_growth"])
+
+def test_duplicate_company_period_keeps_last():
+    df = build_frame([_period("A", "FY2023", 90, 9), _period("A", "FY2023", 100, 10)])
+    assert len(df) == 1 and df.loc["FY2023", "revenue"] == 100
+
+def test_render_table_shows_full_qualified_labels():
+    df = build_frame([_period("Company Alpha", "FY2023", 100, 10), _period("Company Beta", "FY2023", 50, 5)])
+    table = render_table(df)
+    assert "Company Alpha FY2023" in table and "Company Beta FY2023" in table
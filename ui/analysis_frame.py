@@ -1,13 +1,25 @@
 import os
 import re
-import threading
+import time
 import tkinter as tk
 from tkinter import messagebox
 import ttkbootstrap as ttk
 from PIL import Image, ImageTk, ImageSequence
 
 from .config import config
-from .analyzer import analyze_multiple_pdfs, chat_with_openai
+from .analyzer import chat_with_openai
+from .pdf_text import extract_texts, extraction_report
+from .batch import cached_analysis
+from .semantic_cache import semantic_cache, document_set_fingerprint
+from .local_retrieval import OpenAIEmbedder
+from .rate_governor import governor
+from .tracing import span, job_breakdown
+from .usage_ledger import usage_ledger
+from .client_manager import get_client
+from .lifecycle import resource_tracker
+from .service_client import ServiceClient
+from .watcher import FolderWatcher
+from .jobs import scheduler, JobCancelled, PRIORITY_CHAT, PRIORITY_ANALYSIS, PRIORITY_BACKGROUND
 from .pdf_list_frame import PDFListFrame
 from .chat_frame import ChatFrame
 from .settings_dialog import SettingsDialog
@@ -30,6 +42,8 @@ class LoadingAnimation:
         self._job = None
 
     def start(self, **grid_opts):
+        if self._job:
+            return
         self.label.grid(**grid_opts)
         self._animate()
 
@@ -44,11 +58,63 @@ class LoadingAnimation:
             self._job = None
         self.label.grid_forget()
 
+# Incremental Output Helper Class
+class StreamRenderer:
+    """
+    Turns streamed text deltas into insertable chunks. Table rows are held
+    back until the table closes so they can be aligned as one block.
+    """
+    def __init__(self, format_table, prefix=""):
+        self.format_table = format_table
+        self.prefix = prefix
+        self.line = ""
+        self.emitted = 0
+        self.table = []
+
+    def feed(self, delta: str) -> str:
+        out = []
+        self.line += delta
+        while "\n" in self.line:
+            ln, self.line = self.line.split("\n", 1)
+            if ln.startswith("|"):
+                self.table.append(ln)
+            else:
+                out.append(self._flush_table())
+                out.append(ln[self.emitted:] + "\n")
+            self.emitted = 0
+        if self.line and not self.line.startswith("|"):
+            out.append(self._flush_table())
+            out.append(self.line[self.emitted:])
+            self.emitted = len(self.line)
+        return self._with_prefix("".join(out))
+
+    def close(self) -> str:
+        out = self._flush_table()
+        if self.line.startswith("|"):
+            out += self.format_table(self.line)
+        else:
+            out += self.line[self.emitted:]
+        self.line, self.emitted = "", 0
+        return self._with_prefix(out)
+
+    def _flush_table(self) -> str:
+        if not self.table:
+            return ""
+        block = self.format_table("\n".join(self.table)) + "\n"
+        self.table = []
+        return block
+
+    def _with_prefix(self, txt: str) -> str:
+        if txt and self.prefix:
+            txt, self.prefix = self.prefix + txt, ""
+        return txt
+
 # Main AnalysisFrame Class
 class AnalysisFrame:
     def __init__(self, parent, go_back):
         self.frame = ttk.Frame(parent)
         self.current_thread_id = None
+        self.current_files = []
         self.frame.pack(fill=tk.BOTH, expand=True)
         self.frame.grid_rowconfigure(2, weight=1)
         self.frame.grid_rowconfigure(4, weight=1)
@@ -71,24 +137,31 @@ class AnalysisFrame:
         # Toolbar Buttons
         tb = ttk.Frame(self.frame)
         tb.grid(row=1, column=0, sticky="ew", padx=20, pady=10)
-        tb.grid_columnconfigure(2, weight=1)
+        tb.grid_columnconfigure(3, weight=1)
         ttk.Button(tb, text="📁 Upload PDF", command=self.upload, bootstyle="primary").grid(
             row=0, column=0, padx=5
         )
         ttk.Button(tb, text="🔎 Analyze PDFs", command=self.batch_analyze, bootstyle="info").grid(
             row=0, column=1, padx=5
         )
+        ttk.Button(tb, text="📄 Extract Text", command=self.extract_text, bootstyle="info-outline").grid(
+            row=0, column=2, padx=5
+        )
+        self.force_refresh = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tb, text="Force refresh", variable=self.force_refresh).grid(
+            row=0, column=3, padx=5, sticky="w"
+        )
         ttk.Button(tb, text="🪣 Clear Output", command=self._clear_output, bootstyle="dark").grid(
-            row=0, column=3, padx=5
+            row=0, column=4, padx=5
         )
         ttk.Button(tb, text="❌ Delete Selected", command=self.delete, bootstyle="danger").grid(
-            row=0, column=4, padx=5
+            row=0, column=5, padx=5
         )
         ttk.Button(tb, text="🧹 Clear All PDFs", command=self.clear_all, bootstyle="warning").grid(
-            row=0, column=5, padx=5
+            row=0, column=6, padx=5
         )
         ttk.Button(tb, text="⚙️ Settings", command=self.open_settings, bootstyle="secondary").grid(
-            row=0, column=6, padx=5
+            row=0, column=7, padx=5
         )
 
         # PDF List
@@ -100,6 +173,7 @@ class AnalysisFrame:
         self.analysis_anim = LoadingAnimation(self.progress_container, agif, delay=200)
         self.send_anim = LoadingAnimation(self.progress_container, sgif, delay=200, width=sw, height=sh)
         self.progress = ttk.Progressbar(self.progress_container, mode="indeterminate")
+        self.status_label = ttk.Label(self.progress_container, bootstyle="secondary")
 
         # Output Text
         self.output_container = ttk.Labelframe(self.frame, text="Model Output")
@@ -111,6 +185,37 @@ class AnalysisFrame:
         self.chat = ChatFrame(self.frame, on_send=self._on_chat_send)
         self.chat.grid(row=5, column=0, sticky="ew", padx=20, pady=(0,10))
 
+        # Jobs Panel
+        jobs_box = ttk.Labelframe(self.frame, text="Jobs")
+        jobs_box.grid(row=6, column=0, sticky="ew", padx=20, pady=(0,10))
+        jobs_box.grid_columnconfigure(0, weight=1)
+        self.jobs_tree = ttk.Treeview(
+            jobs_box, columns=("job", "state", "elapsed"), show="headings", height=3
+        )
+        for col, text, width in (("job", "Job", 400), ("state", "State", 100), ("elapsed", "Elapsed", 80)):
+            self.jobs_tree.heading(col, text=text)
+            self.jobs_tree.column(col, width=width, stretch=(col == "job"))
+        self.jobs_tree.grid(row=0, column=0, sticky="ew")
+        ttk.Button(jobs_box, text="⛔ Cancel Job", command=self.cancel_job, bootstyle="danger-outline").grid(
+            row=0, column=1, padx=5, sticky="n"
+        )
+        self.api_label = ttk.Label(jobs_box, text=governor.describe(), bootstyle="secondary")
+        self.api_label.grid(row=1, column=0, columnspan=2, sticky="w", pady=(2,0))
+        self.usage_label = ttk.Label(jobs_box, text=usage_ledger.describe(), bootstyle="secondary")
+        self.usage_label.grid(row=2, column=0, columnspan=2, sticky="w")
+        # Where the selected (or last finished) job spent its time, by stage
+        self.timing_label = ttk.Label(jobs_box, text="", font=("Courier New", 9), justify="left")
+        self.timing_label.grid(row=3, column=0, columnspan=2, sticky="w")
+        self.jobs_tree.bind("<<TreeviewSelect>>", lambda e: self._show_timing())
+        self._ticking = False
+        scheduler.add_listener(lambda job: self.frame.after(0, lambda: self._on_job_update(job)))
+
+        if config.gc_on_start and config.api_key and not config.service_url:
+            scheduler.submit(self._run_gc, name="Clean up API resources", priority=PRIORITY_BACKGROUND)
+
+        self.watcher = None
+        self.update_watcher()
+
     def upload(self):
         self.pdf_list.upload()
 
@@ -125,57 +230,199 @@ class AnalysisFrame:
         if not files:
             messagebox.showwarning("Warning", "Select a PDF.")
             return
-        if not (config.api_key and config.assistant_id):
+        if not (config.service_url or (config.api_key and config.assistant_id)):
             messagebox.showwarning("Warning", "Set API Key and Assistant ID.")
             return
 
-        self.progress_container.grid(row=3, column=0, sticky="ew", padx=20, pady=(0,10))
-        self.progress_container.grid_columnconfigure(1, weight=1)
-        self.analysis_anim.start(row=0, column=0, sticky="w", padx=(0,5))
-        self.progress.grid(row=0, column=1, sticky="ew")
-        self.progress.start()
-        self.output_text.after(20, lambda: self.output_text.see(tk.END))
+        self._start_progress(self.analysis_anim)
+        force = self.force_refresh.get()
+        scheduler.submit(
+            lambda: self._run_batch_analysis(files, force),
+            name=f"Analyze {len(files)} PDF(s)",
+            priority=PRIORITY_ANALYSIS
+        )
+
+    def extract_text(self):
+        files = self.pdf_list.get_selected()
+        if not files:
+            messagebox.showwarning("Warning", "Select a PDF.")
+            return
+        self._start_progress(self.analysis_anim)
+        scheduler.submit(
+            lambda: self._run_extraction(files),
+            name=f"Extract text from {len(files)} PDF(s)",
+            priority=PRIORITY_BACKGROUND
+        )
+
+    def _run_extraction(self, files):
+        def on_progress(path, result):
+            status = "failed" if "error" in result else f"{len(result['pages'])} pages"
+            self.frame.after(0, lambda: self._set_status(f"{os.path.basename(path)}: {status}"))
+        try:
+            results = extract_texts(files, on_progress=on_progress)
+            report = extraction_report(results)
+            self.frame.after(0, lambda: self._insert(f"[Text Extraction]\n{report}\n\n"))
+        except Exception as e:
+            msg = str(e)
+            self.frame.after(0, lambda: messagebox.showerror("Error", msg))
+            raise
+
+    def update_watcher(self):
+        """Start, restart or stop the download-folder watcher to match the settings."""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        if config.watch_enabled and config.api_key and config.assistant_id:
+            self.watcher = FolderWatcher(
+                config.default_download_dir, config.api_key, config.assistant_id,
+                on_event=self._on_watch_event
+            )
+            self.watcher.start()
 
-        threading.Thread(target=self._run_batch_analysis, args=(files,), daemon=True).start()
+    def _on_watch_event(self, kind, path, detail):
+        name = os.path.basename(path)
+        messages = {
+            "queued": f"{name}: new file, analysis queued",
+            "duplicate": f"{name}: same content as {os.path.basename(detail)}, skipped",
+            "done": f"{name}: analysis saved as {detail}.md",
+            "failed": f"{name}: analysis failed ({detail})",
+        }
+        msg = f"[Watcher] {messages.get(kind, kind)}\n"
+        self.frame.after(0, lambda: self._insert(msg))
+
+    def _run_gc(self):
+        counts = resource_tracker.gc(get_client(config.api_key), protect=[self.current_thread_id])
+        removed = ", ".join(f"{n} {kind}(s)" for kind, n in counts.items() if n and kind != "failed")
+        if removed:
+            self.frame.after(0, lambda: self._insert(f"[Clean-up] Deleted {removed} past the retention policy\n\n"))
 
     def _on_chat_send(self, message: str):
-        if not (config.api_key and config.assistant_id):
+        if not (config.service_url or (config.api_key and config.assistant_id)):
             messagebox.showwarning("Warning", "Set API Key and Assistant ID.")
             return
         self._append(f"[User]: {message}\n")
-        self.progress_container.grid(row=3, column=0, sticky="ew", padx=20, pady=(0,10))
-        self.progress_container.grid_columnconfigure(1, weight=1)
-        self.send_anim.start(row=0, column=0, sticky="w", padx=(0,5))
-        self.progress.grid(row=0, column=1, sticky="ew")
-        self.progress.start()
-        self.output_text.after(20, lambda: self.output_text.see(tk.END))
+        self._start_progress(self.send_anim)
+        ask_anyway = self.chat.ask_anyway.get()
+        scheduler.submit(
+            lambda: self._run_chat(message, ask_anyway),
+            name=f"Chat: {message[:60]}",
+            priority=PRIORITY_CHAT
+        )
+
+    def _stream_to_output(self, renderer):
+        """Return an on_delta callback that renders into output_text."""
+        def on_delta(delta):
+            chunk = renderer.feed(delta)
+            if chunk:
+                self.frame.after(0, lambda: self._insert(chunk))
+        return on_delta
+
+    def _on_upload_progress(self, path, status, done, total):
+        msg = f"Files {done}/{total} - {os.path.basename(path)}: {status}"
+        self.frame.after(0, lambda: self._set_status(msg))
 
-        threading.Thread(target=self._run_chat, args=(message,), daemon=True).start()
+    def _on_page_report(self, report: str):
+        self.frame.after(0, lambda: self._insert(f"[Page Filter]\n{report}\n\n"))
 
-    def _run_batch_analysis(self, files):
+    def _set_status(self, msg: str):
+        self.status_label.config(text=msg)
+        self.status_label.grid(row=1, column=0, columnspan=2, sticky="w", pady=(2,0))
+
+    def _run_batch_analysis(self, files, force=False):
+        renderer = StreamRenderer(self._format_code_blocks)
         try:
-            res, tid = analyze_multiple_pdfs(files, config.api_key, config.assistant_id)
-            self.current_thread_id = tid
-            self.frame.after(0, lambda: self._append(res + "\n"))
+            if config.service_url:
+                return self._run_remote_analysis(files, force, renderer)
+            self.current_files = list(files)
+            result = cached_analysis(
+                "comparative",
+                files,
+                config.api_key,
+                config.assistant_id,
+                force,
+                on_delta=self._stream_to_output(renderer),
+                on_progress=self._on_upload_progress,
+                on_report=self._on_page_report
+            )
+            self.current_thread_id = result["thread_id"]
+            if result["cached"]:
+                stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["created_at"]))
+                text = result["text"]
+                self.frame.after(0, lambda: self._append(f"[Cached result from {stamp}]\n{text}\n"))
+                return
+            tail = renderer.close()
+            self.frame.after(0, lambda: self._insert(tail + "\n"))
+        except JobCancelled:
+            tail = renderer.close()
+            self.frame.after(0, lambda: self._insert(tail + "\n[Analysis cancelled]\n\n"))
+            raise
         except Exception as e:
-            self.frame.after(0, lambda: messagebox.showerror("Error", str(e)))
-        finally:
-            self.frame.after(0, self._finish)
+            msg = str(e)
+            self.frame.after(0, lambda: messagebox.showerror("Error", msg))
+            raise
 
-    def _run_chat(self, user_message: str):
+    def _run_remote_analysis(self, files, force, renderer):
+        """Run the analysis on the shared service and stream its output here."""
+        self.current_files = list(files)
+        result = ServiceClient().analyze(files, force=force, on_delta=self._stream_to_output(renderer))
+        self.current_thread_id = result["thread_id"]
+        if result["cached"]:
+            text = result["text"]
+            self.frame.after(0, lambda: self._append(f"[Cached result from service]\n{text}\n"))
+            return
+        tail = renderer.close()
+        self.frame.after(0, lambda: self._insert(tail + "\n"))
+
+    def _run_remote_chat(self, user_message, ask_anyway, renderer):
+        result = ServiceClient().chat(
+            user_message, self.current_thread_id, self.current_files,
+            on_delta=self._stream_to_output(renderer), ask_anyway=ask_anyway
+        )
+        self.current_thread_id = result["thread_id"]
+        if result["cached"]:
+            reply = f"[Assistant] (cached answer, similarity {result['score']:.2f}): {result['text']}\n\n"
+            self.frame.after(0, lambda: self._append(reply))
+            return
+        tail = renderer.close()
+        self.frame.after(0, lambda: self._insert(tail + "\n\n"))
+
+    def _run_chat(self, user_message: str, ask_anyway: bool = False):
+        renderer = StreamRenderer(self._format_code_blocks, prefix="[Assistant]: ")
         try:
-            resp, tid = chat_with_openai(
+            if config.service_url:
+                return self._run_remote_chat(user_message, ask_anyway, renderer)
+            fingerprint = vector = embedder = None
+            if config.use_semantic_cache and self.current_files:
+                embedder = OpenAIEmbedder(config.api_key)
+                fingerprint = document_set_fingerprint(self.current_files)
+                if not ask_anyway:
+                    hit, vector = semantic_cache.lookup(fingerprint, user_message, embedder)
+                    self.frame.after(0, lambda: self.chat.show_cache_stats(semantic_cache.stats()))
+                    if hit:
+                        reply = f"[Assistant] (cached answer, similarity {hit['score']:.2f}): {hit['answer']}\n\n"
+                        self.frame.after(0, lambda: self._append(reply))
+                        return
+            text, tid = chat_with_openai(
                 config.api_key,
                 config.assistant_id,
                 user_message,
-                thread_id=self.current_thread_id
+                thread_id=self.current_thread_id,
+                on_delta=self._stream_to_output(renderer),
+                pdf_paths=self.current_files
             )
             self.current_thread_id = tid
-            self.frame.after(0, lambda: self._append(f"[Assistant]: {resp}\n\n"))
+            if fingerprint is not None:
+                semantic_cache.store(fingerprint, user_message, text, embedder, vector)
+            tail = renderer.close()
+            self.frame.after(0, lambda: self._insert(tail + "\n\n"))
+        except JobCancelled:
+            tail = renderer.close()
+            self.frame.after(0, lambda: self._insert(tail + "\n[Chat cancelled]\n\n"))
+            raise
         except Exception as e:
-            self.frame.after(0, lambda: messagebox.showerror("Error", str(e)))
-        finally:
-            self.frame.after(0, self._finish)
+            msg = str(e)
+            self.frame.after(0, lambda: messagebox.showerror("Error", msg))
+            raise
 
     def open_settings(self):
         dlg = SettingsDialog(self.frame, api_key=config.api_key, assistant_id=config.assistant_id)
@@ -183,11 +430,76 @@ class AnalysisFrame:
         if getattr(dlg, "result", None):
             config.api_key, config.assistant_id = dlg.result
             config.save()
+            self.update_watcher()
+
+    def _start_progress(self, anim):
+        self.progress_container.grid(row=3, column=0, sticky="ew", padx=20, pady=(0,10))
+        self.progress_container.grid_columnconfigure(1, weight=1)
+        anim.start(row=0, column=0, sticky="w", padx=(0,5))
+        self.progress.grid(row=0, column=1, sticky="ew")
+        self.progress.start()
+        self.output_text.after(20, lambda: self.output_text.see(tk.END))
+
+    def cancel_job(self):
+        for iid in self.jobs_tree.selection():
+            scheduler.cancel(int(iid))
+
+    def _on_job_update(self, job):
+        values = (job.name, job.state, f"{job.elapsed:.1f}s")
+        iid = str(job.id)
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.item(iid, values=values)
+        else:
+            self.jobs_tree.insert("", 0, iid=iid, values=values)
+        self.api_label.config(text=governor.describe())
+        self.usage_label.config(text=usage_ledger.describe())
+        if job.state in ("done", "failed", "cancelled") and not self.jobs_tree.selection():
+            self._show_timing(job.id)
+        if scheduler.active_count():
+            if not self._ticking:
+                self._ticking = True
+                self.frame.after(1000, self._tick_jobs)
+        else:
+            # The progress bar belongs to all jobs; hide it only when none are left
+            self._finish()
+
+    def _show_timing(self, job_id: int = None):
+        if job_id is None:
+            selection = self.jobs_tree.selection()
+            if not selection:
+                return
+            job_id = int(selection[0])
+        job = scheduler.jobs.get(job_id)
+        breakdown = job_breakdown(job_id)
+        usage = usage_ledger.job_totals(job_id)
+        if usage:
+            breakdown += (
+                f"\n{'tokens':<20}{usage['prompt_tokens'] + usage['completion_tokens']:>9,}"
+                f"  (estimated {usage['estimated_tokens']:,}, ${usage['cost']:.3f})"
+            )
+            for task, model in usage["routes"].items():
+                breakdown += f"\n{'model: ' + task:<20}{model}"
+        if job is not None and breakdown:
+            self.timing_label.config(text=f"{job.name}\n{breakdown}")
+        else:
+            self.timing_label.config(text="")
+
+    def _tick_jobs(self):
+        for job in list(scheduler.jobs.values()):
+            if job.state == "running" and self.jobs_tree.exists(str(job.id)):
+                self.jobs_tree.set(str(job.id), "elapsed", f"{job.elapsed:.1f}s")
+        self.api_label.config(text=governor.describe())
+        if scheduler.active_count():
+            self.frame.after(1000, self._tick_jobs)
+        else:
+            self._ticking = False
 
     def _finish(self):
         self.progress.stop()
         self.analysis_anim.stop()
         self.send_anim.stop()
+        self.status_label.config(text="")
+        self.status_label.grid_forget()
         self.progress_container.grid_forget()
 
     def _clear_output(self):
@@ -202,13 +514,19 @@ class AnalysisFrame:
         self.current_thread_id = None
         
     def _append(self, txt: str):
-        fmt = self._format_code_blocks(txt)
+        self._insert(self._format_code_blocks(txt))
+
+    def _insert(self, txt: str):
         self.output_text.config(state="normal")
-        self.output_text.insert(tk.END, fmt)
+        self.output_text.insert(tk.END, txt)
         self.output_text.config(state="disabled")
         self.output_text.after_idle(lambda: self.output_text.see(tk.END))
 
     def _format_code_blocks(self, txt: str) -> str:
+        with span("format_code_blocks", chars=len(txt)):
+            return self._align_tables(txt)
+
+    def _align_tables(self, txt: str) -> str:
         lines = txt.split("\n")
         table = []
         collecting = False
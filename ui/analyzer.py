@@ -1,198 +1,935 @@
 import os
+import json
 import time
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .config import config
+from .client_manager import get_client
+from .upload_cache import upload_cache, file_sha256
+from .local_retrieval import OpenAIEmbedder, retrieve_context
+from .page_filter import prefilter_pdfs, score_page, select_pages
+from .pdf_text import extract_texts
+from .semantic_cache import document_set_fingerprint
+from .result_cache import map_cache
+from .metrics import PERIOD_SCHEMA, parse_line_items, build_frame, render_table
+from .metrics_store import metrics_store
+from .thread_history import thread_history, count_tokens
+from .rate_governor import governor
+from .lifecycle import resource_tracker
+from .jobs import JobCancelled, current_job, bind_current, check_cancelled
+from .tracing import span, record
+from .usage_ledger import usage_ledger, BudgetExceeded
+
+SINGLE_PDF_PROMPT = (
+    "You are a financial analyst.\n"
+    "1) From the attached PDF, extract all key financial metrics and KPIs presented for the given period.\n"
+    "2) Compute additional commonly used derived indicators if not explicitly stated, such as:\n"
+    "   - Gross Margin = Gross Profit / Revenue\n"
+    "   - Operating Margin = Operating Income / Revenue\n"
+    "   - Net Margin = Net Income / Revenue\n"
+    "   - Return on Assets (ROA) = Net Income / Total Assets\n"
+    "   - EPS (if derivable), etc.\n"
+    "3) Present all metrics in a single well-formatted ASCII table, wrapped in triple backticks:\n"
+    "   - Use '|' as column separators\n"
+    "   - Pad each cell so that all vertical lines align properly\n"
+    "   - Include appropriate headers and column alignment\n"
+    "   - If data is missing for a specific metric-period combination, explicitly fill the cell with 'NA'.\n"
+    "   - Ensure the table is a complete rectangle with all rows and columns filled."
+    "   - The first column(including Metric) should take up 30 characters in length, and the other columns should take up 15 characters in length\n"
+    "4) After the table, write two sections:\n"
+    "   a) 'Row Analysis:': One sentence per metric explaining its meaning and significance\n"
+    "   b) 'Overall Summary:': A paragraph summarizing financial insights for this report\n"
+    "5) Finally, under 'Visualization Suggestions:', recommend up to 3 types of charts that could effectively present this data to stakeholders.\n"
+    "6) Do not include any unrelated commentary."
+)
+
+MULTI_PDF_PROMPT = (
+    "You are a financial analyst.\n"
+    "1) Analyze the attached multiple PDF files, each of which represents a different financial period (e.g., different quarters or years).\n"
+    "2) Extract comparable financial metrics across all periods, and compute derived metrics, such as:\n"
+    "   - Gross Margin, Net Margin, ROA, Operating Margin\n"
+    "   - Year-over-Year (YoY) or Quarter-over-Quarter (QoQ) growth\n"
+    "   - EPS and other investor-relevant KPIs\n"
+    "3) Build an ASCII table that summarizes the raw and computed metrics across all periods:\n"
+    "   - Wrap it in triple backticks (```)\n"
+    "   - Use '|' to separate columns and pad cells so vertical lines align\n"
+    "   - Each row should represent a metric; each column a period (e.g., Q1 FY24, Q2 FY24, etc.)\n"
+    "   - If data is missing for a specific metric-period combination, explicitly fill the cell with 'NA'.\n"
+    "   - Ensure the table is a complete rectangle with all rows and columns filled."
+    "   - The first column(including Metric) should take up 30 characters in length, and the other columns should take up 15 characters in length\n"
+    "4) After the table, include the following sections:\n"
+    "   a) 'Comparative Analysis:': Discuss significant trends, changes, and anomalies between periods\n"
+    "   b) 'Risk Assessment:': Identify financial or operational risks implied by the data (e.g., declining margins, increasing debt, slowed revenue growth)\n"
+    "   c) 'Strategic Insights:': Suggest potential areas for improvement or opportunities indicated by the data\n"
+    "5) Under 'Visualization Suggestions:', recommend up to 3 charts (e.g., line, stacked bar) that would best highlight these comparative insights.\n"
+    "6) Keep the output clean and professional, limited to the table and the four labeled sections."
+)
+
+MAP_PROMPT = (
+    "You are a financial analyst.\n"
+    "From the attached PDF, which covers a single financial period, produce a compact metrics summary:\n"
+    "1) First line: 'Company: <name>'. Second line: 'Period: <period label, e.g. Q2 FY24 or FY2023>'.\n"
+    "2) Then one line per reported metric as 'Metric: value unit', covering revenue, gross profit, operating income,\n"
+    "   net income, EPS, total assets, total liabilities, equity, operating cash flow and any headline KPIs.\n"
+    "3) Use the figures exactly as reported; write 'NA' for metrics that are not reported.\n"
+    "4) Finish with 'Notes:' and at most three short bullet points on one-off items or risks.\n"
+    "5) Output only the summary, no tables and no other commentary."
+)
+
+REDUCE_PROMPT = (
+    "The PDF files are not attached. Each section below is a metrics summary extracted from one of the files; "
+    "treat the summaries as the attached PDFs and their periods as the periods to compare.\n\n"
+)
+
+EXTRACT_PROMPT = (
+    "You are a financial data extractor.\n"
+    "From the attached PDF, extract the reported line items for the period it covers "
+    "(or for each period if it reports several, e.g. current year and prior year).\n"
+    "Reply with JSON only: a list of objects matching this JSON schema:\n"
+    + json.dumps(PERIOD_SCHEMA) + "\n"
+    "Use the figures exactly as reported, as plain numbers (negative for losses, no thousands separators), "
+    "in the unit stated in the report. Use null for items that are not reported. "
+    "Do not compute ratios and do not add any text outside the JSON."
+)
+
+KNOWN_PERIODS_NOTE = (
+    "\nThese periods are already on record (company | period). If the report covers any of them, "
+    "include it with the company and period written exactly as below and every line item null:\n"
+)
+
+NARRATIVE_PROMPT = (
+    "You are a financial analyst. The table below was computed from the attached reports' figures and is correct; "
+    "do not repeat or reformat it.\n"
+    "Write only these labeled sections:\n"
+    "a) 'Comparative Analysis:': significant trends, changes and anomalies between periods\n"
+    "b) 'Risk Assessment:': financial or operational risks implied by the data\n"
+    "c) 'Strategic Insights:': potential areas for improvement or opportunities\n"
+    "d) 'Visualization Suggestions:': up to 3 charts that would best present these figures\n\n"
+)
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for your own later reference in at most 200 words. "
+    "Keep every figure, period and conclusion that was stated; do not use the attached files.\n\n"
+)
+
+LOCAL_CONTEXT_NOTE = (
+    "Note: the PDF files are not attached. The relevant excerpts of each file are "
+    "given below, one section per file; treat them as the attached PDFs.\n\n"
+)
+
+# file_search puts at most ~20 chunks of ~800 tokens in front of the model per run
+FILE_SEARCH_CONTEXT_TOKENS = 16000
+
+def _upload_pdf(client, api_key: str, pdf_path: str, use_cache: bool = None) -> str:
+    """
+    Upload a PDF and return its file_id, reusing a cached upload when allowed.
+    """
+    if use_cache is None:
+        use_cache = config.use_upload_cache
+    with span("upload", file=os.path.basename(pdf_path), cached=bool(use_cache)):
+        if use_cache:
+            file_id = upload_cache.get_or_upload(client, api_key, pdf_path)
+        else:
+            with open(pdf_path, "rb") as f:
+                file_id = client.files.create(file=f, purpose="assistants").id
+    resource_tracker.track(client, "file", file_id)
+    return file_id
+
+def _new_thread(client):
+    """Create a thread and record it for later clean-up."""
+    with span("thread_create"):
+        thread = client.beta.threads.create()
+    resource_tracker.track(client, "thread", thread.id)
+    return thread
+
+def _add_message(client, **message):
+    """Add a message to a thread (threads.messages.create arguments)."""
+    with span("message_create", attachments=len(message.get("attachments") or [])):
+        return client.beta.threads.messages.create(**message)
+
+def _prepare_pdfs(pdf_paths: list[str], on_report=None) -> list[str]:
+    """
+    Swap each PDF for a compact bundle of its financial-statement pages when
+    the page filter is enabled; on_report receives the kept-pages report.
+    """
+    if not config.use_page_filter:
+        return pdf_paths
+    with span("prefilter", files=len(pdf_paths)):
+        paths, report = prefilter_pdfs(pdf_paths)
+    if on_report:
+        on_report(report)
+    return paths
+
+def _upload_many(
+    client,
+    api_key: str,
+    pdf_paths: list[str],
+    use_cache: bool = None,
+    on_progress=None
+) -> list[str]:
+    """
+    Upload PDFs concurrently through a bounded pool and return their file_ids
+    in input order. Each file is retried on its own; files that still fail
+    are reported together after the rest of the batch has finished.
+    on_progress(path, status, done, total) is called as files complete.
+    """
+    total = len(pdf_paths)
+    done = 0
+
+    def report(path, status):
+        if on_progress:
+            on_progress(path, status, done, total)
+
+    def upload(path):
+        for attempt in range(config.upload_retries + 1):
+            check_cancelled()
+            try:
+                return _upload_pdf(client, api_key, path, use_cache)
+            except Exception:
+                if attempt == config.upload_retries:
+                    raise
+                report(path, f"retrying ({attempt + 1})")
+                time.sleep(2 ** attempt)
+
+    file_ids, failures = {}, {}
+    workers = max(1, min(config.upload_workers, total))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(bind_current(upload), p): p for p in pdf_paths}
+        for fut in as_completed(futures):
+            path = futures[fut]
+            done += 1
+            try:
+                file_ids[path] = fut.result()
+                report(path, "uploaded")
+            except JobCancelled:
+                raise
+            except Exception as e:
+                failures[path] = e
+                report(path, "failed")
+
+    if failures:
+        detail = "; ".join(f"{os.path.basename(p)}: {e}" for p, e in failures.items())
+        raise RuntimeError(f"Upload failed for {len(failures)} of {total} files: {detail}")
+    return [file_ids[p] for p in pdf_paths]
+
+def _message_text(msg) -> str:
+    try:
+        return msg.content[0].text.value
+    except Exception:
+        return msg.content
+
+class RunRateLimited(RuntimeError):
+    """A run failed because the account hit its rate limit; safe to retry."""
+
+class RunDeadlineExceeded(RuntimeError):
+    """A run was still active at its deadline and has been cancelled."""
+
+def _cancel_run(client, thread_id: str, run_id: str):
+    try:
+        client.beta.threads.runs.cancel(run_id=run_id, thread_id=thread_id)
+    except Exception:
+        pass
+
+def _run_failed(client, thread_id: str, run):
+    """Raise for a run that ended without a usable reply."""
+    if run.status == "requires_action":
+        # No tools are wired up here; free the thread instead of leaving it locked
+        _cancel_run(client, thread_id, run.id)
+        raise RuntimeError("Assistant run requires_action: tool calls are not supported")
+    check_cancelled()
+    code = getattr(getattr(run, "last_error", None), "code", None)
+    if run.status == "failed" and code == "rate_limit_exceeded":
+        raise RunRateLimited("Assistant run rate limited")
+    raise RuntimeError(f"Assistant run {run.status}")
+
+def _incomplete_note(run) -> str:
+    reason = getattr(getattr(run, "incomplete_details", None), "reason", None) or "unknown reason"
+    return f"\n\n[Reply incomplete: {reason}]"
+
+def _run_deadline() -> float:
+    """Monotonic time at which a run started now is cancelled (inf without a deadline)."""
+    if not config.run_deadline_seconds:
+        return float("inf")
+    return time.monotonic() + config.run_deadline_seconds
+
+def _deadline_passed(client, thread_id: str, run_id: str, deadline: float):
+    if time.monotonic() > deadline:
+        _cancel_run(client, thread_id, run_id)
+        raise RunDeadlineExceeded(
+            f"Assistant run exceeded its {config.run_deadline_seconds}s deadline"
+        )
+
+def _track_run(client, thread_id: str, run_id: str):
+    """Let the current job cancel this run server-side."""
+    job = current_job()
+    if job is not None:
+        job.attach_run(client, thread_id, run_id)
+
+def _untrack_run(run_id: str):
+    job = current_job()
+    if job is not None:
+        job.detach_run(run_id)
+
+def _text_of_delta(event) -> str:
+    """Text carried by a thread.message.delta event ("" for other events)."""
+    if event.event != "thread.message.delta":
+        return ""
+    return "".join(
+        block.text.value or ""
+        for block in event.data.delta.content or []
+        if getattr(block, "text", None) is not None
+    )
+
+def _stream_run(client, thread_id: str, assistant_id: str, on_delta=None, task=None, **run_options) -> str:
+    """
+    Run the assistant over a server-sent event stream, forwarding text deltas.
+    The deadline and job cancellation are checked on every event. Silent
+    stretches (queued runs, file search) are bounded by a read timeout at
+    the deadline, and a watchdog cancels the run server-side (which ends
+    the stream) as soon as the job is cancelled or the deadline passes.
+    """
+    parts = []
+    run_id = None
+    deadline = _run_deadline()
+    job = current_job()
+    # Until the first delta the run is queued or reading files; after it, generating
+    started = time.perf_counter()
+    first_delta = None
+    with client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        timeout=min(config.http_timeout, (config.run_deadline_seconds or config.http_timeout) + 1),
+        **run_options
+    ) as stream:
+        finished = threading.Event()
+        stopped = []
+
+        def watchdog():
+            while not finished.wait(0.5):
+                cancelled = job is not None and job.cancel_event.is_set()
+                if cancelled or time.monotonic() > deadline:
+                    stopped.append("cancelled" if cancelled else "deadline")
+                    if run_id is not None:
+                        _cancel_run(client, thread_id, run_id)
+                    stream.close()
+                    return
+
+        threading.Thread(target=watchdog, daemon=True).start()
+        try:
+            for event in stream:
+                if run_id is None and event.event == "thread.run.created":
+                    run_id = event.data.id
+                    _track_run(client, thread_id, run_id)
+                check_cancelled()
+                if run_id is not None:
+                    _deadline_passed(client, thread_id, run_id, deadline)
+                delta = _text_of_delta(event)
+                if not delta:
+                    continue
+                if first_delta is None:
+                    first_delta = time.perf_counter()
+                    record("run_queued", first_delta - started, streamed=True, task=task)
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+        except Exception:
+            if not stopped and time.monotonic() <= deadline:
+                raise
+            if not stopped:
+                # Read timeout at the deadline during a silent stretch
+                stopped.append("deadline")
+                if run_id is not None:
+                    _cancel_run(client, thread_id, run_id)
+        finally:
+            finished.set()
+        if stopped:
+            if run_id is not None:
+                _untrack_run(run_id)
+            check_cancelled()
+            raise RunDeadlineExceeded(
+                f"Assistant run exceeded its {config.run_deadline_seconds}s deadline"
+            )
+        run = stream.get_final_run()
+        _untrack_run(run.id)
+        usage_ledger.record_run(run, task)
+        ended = time.perf_counter()
+        if first_delta is None:
+            record("run_queued", ended - started, streamed=True, status=run.status, task=task, model=run.model)
+        else:
+            record("run_in_progress", ended - first_delta, streamed=True, status=run.status,
+                   task=task, model=run.model)
+        if run.status not in ("completed", "incomplete"):
+            _run_failed(client, thread_id, run)
+        final = [m for m in stream.get_final_messages() if m.role == "assistant"]
+    text = _message_text(final[-1]) if final else "".join(parts)
+    if run.status == "incomplete":
+        note = _incomplete_note(run)
+        if on_delta:
+            on_delta(note)
+        text += note
+    return text
+
+def _poll_run(client, thread_id: str, assistant_id: str, on_delta=None, task=None, **run_options) -> str:
+    """
+    Create a run and poll its status with adaptive backoff until it reaches
+    a terminal status or its deadline.
+    """
+    with span("run_create"):
+        run = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            **run_options
+        )
+    _track_run(client, thread_id, run.id)
+    deadline = _run_deadline()
+    delay = config.poll_interval_min
+    # Wall time between polls is attributed to the status seen at the earlier poll
+    spent = {"queued": 0.0, "in_progress": 0.0}
+    polls = {"queued": 0, "in_progress": 0}
+    status, since = run.status, time.perf_counter()
+    current = None
+    try:
+        while True:
+            check_cancelled()
+            current = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+            now = time.perf_counter()
+            if status in spent:
+                spent[status] += now - since
+                polls[status] += 1
+            status, since = current.status, now
+            if current.status in ("completed", "incomplete"):
+                break
+            if current.status not in ("queued", "in_progress", "cancelling"):
+                _run_failed(client, thread_id, current)
+            _deadline_passed(client, thread_id, run.id, deadline)
+            time.sleep(delay)
+            delay = min(delay * 1.5, config.poll_interval_max)
+    finally:
+        _untrack_run(run.id)
+        model = getattr(current, "model", None)
+        if current is not None:
+            usage_ledger.record_run(current, task)
+        record("run_queued", spent["queued"], polls=polls["queued"], task=task, model=model)
+        record("run_in_progress", spent["in_progress"], polls=polls["in_progress"], status=status,
+               task=task, model=model)
+
+    # Newest messages first; the reply is among the first few
+    with span("fetch"):
+        messages = client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=5).data
+    reply = next((m for m in messages if m.role == "assistant"), None)
+    text = _message_text(reply) if reply else ""
+    if current.status == "incomplete":
+        text += _incomplete_note(current)
+    if on_delta:
+        on_delta(text)
+    return text
+
+def route_signature() -> str:
+    """The routing settings that decide which model answers; part of result cache keys."""
+    if not config.use_model_routing:
+        return ""
+    return json.dumps(
+        [config.fast_model, config.strong_model, config.model_routes, config.route_instructions],
+        sort_keys=True
+    )
+
+def _route(task: str, run_options: dict) -> dict:
+    """
+    Run options for task under config.model_routes: the "fast" or "strong"
+    tier's model (an empty model keeps the assistant's own) and any extra
+    instructions from config.route_instructions. Explicit run_options win.
+    """
+    options = dict(run_options)
+    if not config.use_model_routing:
+        return options
+    tier = config.model_routes.get(task, "strong")
+    model = config.fast_model if tier == "fast" else config.strong_model
+    if model:
+        options.setdefault("model", model)
+    extra = config.route_instructions.get(task)
+    if extra:
+        options["additional_instructions"] = "\n\n".join(
+            filter(None, [options.get("additional_instructions"), extra])
+        )
+    return options
+
+def _execute_run(client, thread_id: str, assistant_id: str, on_delta=None, task: str = "comparison",
+                 **run_options) -> str:
+    """
+    Run the assistant on a thread, streaming when possible, and return the reply.
+    on_delta (if given) receives the reply incrementally; in polling mode it
+    receives the whole reply once. run_options are passed to the run
+    (e.g. truncation_strategy, additional_instructions), after the model and
+    instructions routed for task ("single", "comparison", "map", "extract",
+    "chat", "chat_short" or "summary"). Runs that fail on the account rate
+    limit are retried with the governor's backoff.
+    """
+    usage_ledger.check_job()
+    run_options = _route(task, run_options)
+    run = _poll_run
+    if config.use_streaming and hasattr(client.beta.threads.runs, "stream"):
+        run = _stream_run
+    attempts = config.http_max_retries
+    for attempt in range(attempts + 1):
+        try:
+            return run(client, thread_id, assistant_id, on_delta, task, **run_options)
+        except RunRateLimited:
+            if attempt == attempts:
+                raise
+            governor.record_retry(True)
+            time.sleep(governor.backoff(attempt))
+
+def _summarize(client, assistant_id: str, text: str) -> str:
+    """Condense earlier conversation turns on a scratch thread."""
+    with span("thread_create", scratch=True):
+        thread = client.beta.threads.create()
+    try:
+        _add_message(
+            client,
+            thread_id=thread.id,
+            role="user",
+            content=SUMMARY_PROMPT + text
+        )
+        return _execute_run(client, thread.id, assistant_id, task="summary")
+    finally:
+        try:
+            client.beta.threads.delete(thread.id)
+        except Exception:
+            pass
+
+def _document_tokens(pdf_paths: list[str]) -> dict:
+    """Tokens of each PDF's text as it would be uploaded (page-filtered when enabled)."""
+    texts = extract_texts(pdf_paths)
+    tokens = {}
+    for path in pdf_paths:
+        pages = texts[path].get("pages")
+        if not pages:
+            # No text layer to count; assume file_search fills its context
+            tokens[path] = FILE_SEARCH_CONTEXT_TOKENS
+            continue
+        if config.use_page_filter:
+            kept = select_pages([score_page(t) for t in pages]) or range(len(pages))
+            pages = [pages[i] for i in kept]
+        tokens[path] = sum(count_tokens(t) for t in pages)
+    return tokens
+
+def estimate_tokens(pdf_paths: list[str], mode: str, assistant_id: str = None) -> int:
+    """
+    tiktoken pre-estimate of the prompt and reply tokens of an analysis in
+    mode ("single" for analyze_pdf_with_openai). Documents whose map summary
+    or line items are already cached are not counted.
+    """
+    docs = _document_tokens(pdf_paths)
+    reply = config.budget_reply_tokens
+    retrieved = lambda n: min(n, FILE_SEARCH_CONTEXT_TOKENS)
+    # A comparison searches each file, so retrieval is bounded per file, not per run
+    retrieved_all = sum(retrieved(n) for n in docs.values())
+    if mode == "single":
+        return count_tokens(SINGLE_PDF_PROMPT) + retrieved_all + reply
+    if mode == "local":
+        excerpts = min(sum(docs.values()), config.local_top_k * config.chunk_tokens * len(pdf_paths))
+        return count_tokens(MULTI_PDF_PROMPT + LOCAL_CONTEXT_NOTE) + excerpts + reply
+    if mode == "map_reduce":
+        todo = [p for p in pdf_paths if not map_cache.get([p], assistant_id, mode="map")]
+        per_doc = sum(count_tokens(MAP_PROMPT) + retrieved(docs[p]) + reply for p in todo)
+        return per_doc + count_tokens(MULTI_PDF_PROMPT + REDUCE_PROMPT) + reply * (len(pdf_paths) + 1)
+    if mode == "structured":
+        todo = [p for p in pdf_paths if not metrics_store.periods_for_source(file_sha256(p))]
+        per_doc = sum(count_tokens(EXTRACT_PROMPT) + retrieved(docs[p]) + reply for p in todo)
+        return per_doc + count_tokens(NARRATIVE_PROMPT) + reply * 2  # table + narrative
+    return count_tokens(MULTI_PDF_PROMPT) + retrieved_all + reply
+
+def _within_budget(pdf_paths: list[str], assistant_id: str, mode: str, on_report=None) -> str:
+    """
+    Check an analysis against the token budgets before anything is uploaded.
+    Returns the mode to run in (comparisons may be downgraded to "local")
+    or raises BudgetExceeded. Without budgets nothing is estimated.
+    """
+    if not (config.budget_job_tokens or config.budget_day_tokens):
+        usage_ledger.record_estimate(None, document_set_fingerprint(pdf_paths), assistant_id, mode)
+        return mode
+    estimate = estimate_tokens(pdf_paths, mode, assistant_id)
+    reason = usage_ledger.check(estimate)
+    if reason and config.budget_action == "downgrade" and mode not in ("single", "local"):
+        local = estimate_tokens(pdf_paths, "local", assistant_id)
+        if not usage_ledger.check(local):
+            if on_report:
+                on_report(f"Budget: {reason}; running in local mode instead ({local:,} tokens estimated)")
+            mode, estimate, reason = "local", local, ""
+    if reason:
+        raise BudgetExceeded(f"Analysis refused: {reason}")
+    usage_ledger.record_estimate(estimate, document_set_fingerprint(pdf_paths), assistant_id, mode)
+    return mode
 
 def analyze_pdf_with_openai(
     pdf_path: str,
     api_key: str,
-    assistant_id: str
+    assistant_id: str,
+    use_cache: bool = None,
+    on_delta=None,
+    on_report=None
 ) -> str:
     """
     Upload and analyze a single PDF.
     """
-    client = OpenAI(api_key=api_key)
+    _within_budget([pdf_path], assistant_id, "single")
+    client = get_client(api_key)
 
-    # 1) Upload the PDF
-    with open(pdf_path, "rb") as f:
-        upload_resp = client.files.create(file=f, purpose="assistants")
-    file_id = upload_resp.id
+    # 1) Upload the PDF's financial pages (or reuse a cached upload)
+    upload_path = _prepare_pdfs([pdf_path], on_report)[0]
+    file_id = _upload_pdf(client, api_key, upload_path, use_cache)
 
     # 2) Create a conversation thread and send the prompt
-    thread = client.beta.threads.create()
-    prompt = (
-        "You are a financial analyst.\n"
-        "1) From the attached PDF, extract all key financial metrics and KPIs presented for the given period.\n"
-        "2) Compute additional commonly used derived indicators if not explicitly stated, such as:\n"
-        "   - Gross Margin = Gross Profit / Revenue\n"
-        "   - Operating Margin = Operating Income / Revenue\n"
-        "   - Net Margin = Net Income / Revenue\n"
-        "   - Return on Assets (ROA) = Net Income / Total Assets\n"
-        "   - EPS (if derivable), etc.\n"
-        "3) Present all metrics in a single well-formatted ASCII table, wrapped in triple backticks:\n"
-        "   - Use '|' as column separators\n"
-        "   - Pad each cell so that all vertical lines align properly\n"
-        "   - Include appropriate headers and column alignment\n"
-        "   - If data is missing for a specific metric-period combination, explicitly fill the cell with 'NA'.\n"
-        "   - Ensure the table is a complete rectangle with all rows and columns filled."
-        "   - The first column(including Metric) should take up 30 characters in length, and the other columns should take up 15 characters in length\n"
-        "4) After the table, write two sections:\n"
-        "   a) 'Row Analysis:': One sentence per metric explaining its meaning and significance\n"
-        "   b) 'Overall Summary:': A paragraph summarizing financial insights for this report\n"
-        "5) Finally, under 'Visualization Suggestions:', recommend up to 3 types of charts that could effectively present this data to stakeholders.\n"
-        "6) Do not include any unrelated commentary."
-    )
-    client.beta.threads.messages.create(
+    thread = _new_thread(client)
+    _add_message(
+        client,
         thread_id=thread.id,
         role="user",
-        content=prompt,
+        content=SINGLE_PDF_PROMPT,
         attachments=[{"file_id": file_id, "tools": [{"type": "file_search"}]}]
     )
 
-    # 3) Trigger the assistant run
-    run = client.beta.threads.runs.create(
-        thread_id=thread.id,
-        assistant_id=assistant_id
-    )
-
-    # 4) Poll until done
-    while True:
-        status = client.beta.threads.runs.retrieve(
-            thread_id=thread.id, run_id=run.id
-        ).status
-        if status == "completed":
-            break
-        if status == "failed":
-            raise RuntimeError("Assistant run failed")
-        time.sleep(1)
-
-    # 5) Fetch and return the assistant's response
-    messages = client.beta.threads.messages.list(thread_id=thread.id).data
-    assistant_msg = next(m for m in messages if m.role == "assistant")
-    try:
-        return assistant_msg.content[0].text.value
-    except Exception:
-        return assistant_msg.content
+    # 3) Run the assistant and return its response
+    return _execute_run(client, thread.id, assistant_id, on_delta, task="single")
 
 def analyze_multiple_pdfs(
     pdf_paths: list[str],
     api_key: str,
-    assistant_id: str
+    assistant_id: str,
+    use_cache: bool = None,
+    on_delta=None,
+    on_progress=None,
+    on_report=None
 ) -> tuple[str, str]:
     """
     Upload multiple PDFs and perform one combined analysis.
     """
-    client = OpenAI(api_key=api_key)
+    client = get_client(api_key)
 
-    # 1) Upload all PDFs
-    attachments = []
-    for path in pdf_paths:
-        with open(path, "rb") as f:
-            up = client.files.create(file=f, purpose="assistants")
-        attachments.append({
-            "file_id": up.id,
-            "tools": [{"type": "file_search"}]
-        })
+    # 1) Upload all PDFs' financial pages in parallel (or reuse cached uploads)
+    upload_paths = _prepare_pdfs(pdf_paths, on_report)
+    file_ids = _upload_many(client, api_key, upload_paths, use_cache, on_progress)
+    attachments = [
+        {"file_id": file_id, "tools": [{"type": "file_search"}]}
+        for file_id in file_ids
+    ]
 
     # 2) Create thread and send batch prompt
-    thread = client.beta.threads.create()
-    prompt = (
-        "You are a financial analyst.\n"
-        "1) Analyze the attached multiple PDF files, each of which represents a different financial period (e.g., different quarters or years).\n"
-        "2) Extract comparable financial metrics across all periods, and compute derived metrics, such as:\n"
-        "   - Gross Margin, Net Margin, ROA, Operating Margin\n"
-        "   - Year-over-Year (YoY) or Quarter-over-Quarter (QoQ) growth\n"
-        "   - EPS and other investor-relevant KPIs\n"
-        "3) Build an ASCII table that summarizes the raw and computed metrics across all periods:\n"
-        "   - Wrap it in triple backticks (```)\n"
-        "   - Use '|' to separate columns and pad cells so vertical lines align\n"
-        "   - Each row should represent a metric; each column a period (e.g., Q1 FY24, Q2 FY24, etc.)\n"
-        "   - If data is missing for a specific metric-period combination, explicitly fill the cell with 'NA'.\n"
-        "   - Ensure the table is a complete rectangle with all rows and columns filled."
-        "   - The first column(including Metric) should take up 30 characters in length, and the other columns should take up 15 characters in length\n"
-        "4) After the table, include the following sections:\n"
-        "   a) 'Comparative Analysis:': Discuss significant trends, changes, and anomalies between periods\n"
-        "   b) 'Risk Assessment:': Identify financial or operational risks implied by the data (e.g., declining margins, increasing debt, slowed revenue growth)\n"
-        "   c) 'Strategic Insights:': Suggest potential areas for improvement or opportunities indicated by the data\n"
-        "5) Under 'Visualization Suggestions:', recommend up to 3 charts (e.g., line, stacked bar) that would best highlight these comparative insights.\n"
-        "6) Keep the output clean and professional, limited to the table and the four labeled sections."
-    )
-    client.beta.threads.messages.create(
+    thread = _new_thread(client)
+    _add_message(
+        client,
         thread_id=thread.id,
         role="user",
-        content=prompt,
+        content=MULTI_PDF_PROMPT,
         attachments=attachments
     )
 
-    # 3) Trigger the assistant run
-    run = client.beta.threads.runs.create(
+    # 3) Run the assistant and return its response
+    text = _execute_run(client, thread.id, assistant_id, on_delta)
+    return text, thread.id
+
+def analyze_pdfs_locally(
+    pdf_paths: list[str],
+    api_key: str,
+    assistant_id: str,
+    embedder=None,
+    on_delta=None
+) -> tuple[str, str]:
+    """
+    Analyze PDFs without uploading them: retrieve the most relevant chunks
+    from local FAISS indexes and send only those in the prompt.
+    """
+    client = get_client(api_key)
+    embedder = embedder or OpenAIEmbedder(api_key)
+
+    # 1) Retrieve top-k chunks per document from the local indexes
+    context = retrieve_context(pdf_paths, embedder)
+
+    # 2) Create thread and send prompt with the excerpts inline
+    prompt = SINGLE_PDF_PROMPT if len(pdf_paths) == 1 else MULTI_PDF_PROMPT
+    thread = _new_thread(client)
+    _add_message(
+        client,
         thread_id=thread.id,
-        assistant_id=assistant_id
+        role="user",
+        content=f"{prompt}\n\n{LOCAL_CONTEXT_NOTE}{context}"
     )
 
-    # 4) Poll until done
-    while True:
-        status = client.beta.threads.runs.retrieve(
-            thread_id=thread.id, run_id=run.id
-        ).status
-        if status == "completed":
-            break
-        if status == "failed":
-            raise RuntimeError("Assistant run failed")
-        time.sleep(1)
-
-    # 5) Fetch and return the assistant's response
-    messages = client.beta.threads.messages.list(thread_id=thread.id).data
-    assistant_msg = next(m for m in messages if m.role == "assistant")
-    try:
-        text = assistant_msg.content[0].text.value
-    except Exception:
-        text = assistant_msg.content
+    # 3) Run the assistant and return its response
+    task = "single" if len(pdf_paths) == 1 else "comparison"
+    text = _execute_run(client, thread.id, assistant_id, on_delta, task=task)
     return text, thread.id
 
-def chat_with_openai(
+def _map_summary(client, api_key: str, assistant_id: str, pdf_path: str, use_cache: bool = None) -> tuple[str, bool]:
+    """
+    Summarize one PDF into per-period metrics; returns (summary, from_cache).
+    """
+    cached = map_cache.get([pdf_path], assistant_id, mode="map")
+    if cached:
+        return cached["text"], True
+    upload_path = _prepare_pdfs([pdf_path])[0]
+    file_id = _upload_pdf(client, api_key, upload_path, use_cache)
+    thread = _new_thread(client)
+    _add_message(
+        client,
+        thread_id=thread.id,
+        role="user",
+        content=MAP_PROMPT,
+        attachments=[{"file_id": file_id, "tools": [{"type": "file_search"}]}]
+    )
+    summary = _execute_run(client, thread.id, assistant_id, task="map")
+    map_cache.put([pdf_path], assistant_id, summary, thread.id, mode="map")
+    return summary, False
+
+def analyze_map_reduce(
+    pdf_paths: list[str],
     api_key: str,
     assistant_id: str,
-    user_message: str,
-    thread_id: str = None
+    use_cache: bool = None,
+    on_delta=None,
+    on_progress=None,
+    on_report=None
 ) -> tuple[str, str]:
     """
-    Send a plain-text chat message to the Assistants API and return the assistant's reply.
+    Summarize each PDF concurrently (map), then build the comparative
+    analysis from the summaries in one run (reduce). Map summaries are
+    cached per document and reused across batch selections.
     """
-    client = OpenAI(api_key=api_key)
+    client = get_client(api_key)
 
-    # Create thread and send message
-    if thread_id:
-        thread = client.beta.threads.retrieve(thread_id=thread_id)
-    else:
-        thread = client.beta.threads.create()
-    client.beta.threads.messages.create(
+    # 1) Map: one compact metrics summary per PDF
+    total = len(pdf_paths)
+    summaries, failures = {}, {}
+    done = 0
+    workers = max(1, min(config.map_workers, total))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(bind_current(_map_summary), client, api_key, assistant_id, p, use_cache): p
+            for p in pdf_paths
+        }
+        for fut in as_completed(futures):
+            path = futures[fut]
+            done += 1
+            try:
+                summaries[path], from_cache = fut.result()
+                status = "summary cached" if from_cache else "summarized"
+            except JobCancelled:
+                raise
+            except Exception as e:
+                failures[path] = e
+                status = "failed"
+            if on_progress:
+                on_progress(path, status, done, total)
+    if not summaries:
+        raise RuntimeError("Every document failed to summarize")
+    if failures and on_report:
+        on_report("\n".join(f"{os.path.basename(p)}: left out ({e})" for p, e in failures.items()))
+
+    # 2) Reduce: comparative table and sections from the summaries
+    sections = "\n\n".join(
+        f"=== {os.path.basename(p)} ===\n{summaries[p]}" for p in pdf_paths if p in summaries
+    )
+    thread = _new_thread(client)
+    _add_message(
+        client,
         thread_id=thread.id,
         role="user",
-        content=user_message
+        content=f"{MULTI_PDF_PROMPT}\n\n{REDUCE_PROMPT}{sections}"
     )
+    text = _execute_run(client, thread.id, assistant_id, on_delta)
+    return text, thread.id
 
-    # Trigger run
-    run = client.beta.threads.runs.create(
+def _extract_line_items(client, api_key: str, assistant_id: str, pdf_path: str, use_cache: bool = None) -> tuple[list, bool]:
+    """
+    Extract raw line items of one PDF as period dicts; returns (periods, from_cache).
+    Files already in the metrics store are not sent to the model, and periods
+    stored from other filings are requested without figures and filled in
+    from the store.
+    """
+    sha = file_sha256(pdf_path)
+    stored = metrics_store.periods_for_source(sha)
+    if stored:
+        return stored, True
+    # Periods of the companies named in this file that other filings already reported
+    pages = extract_texts([pdf_path])[pdf_path].get("pages") or []
+    known = metrics_store.known_periods("\n".join(pages))
+    prompt = EXTRACT_PROMPT
+    if known:
+        prompt += KNOWN_PERIODS_NOTE + "\n".join(f"- {c} | {p}" for c, p in known)
+    upload_path = _prepare_pdfs([pdf_path])[0]
+    file_id = _upload_pdf(client, api_key, upload_path, use_cache)
+    thread = _new_thread(client)
+    _add_message(
+        client,
         thread_id=thread.id,
-        assistant_id=assistant_id
+        role="user",
+        content=prompt,
+        attachments=[{"file_id": file_id, "tools": [{"type": "file_search"}]}]
     )
+    reply = _execute_run(client, thread.id, assistant_id, task="extract")
+    periods = metrics_store.fill_known(parse_line_items(reply))
+    metrics_store.upsert_periods(periods, sha)
+    return periods, False
 
-    # Poll until done
-    while True:
-        status = client.beta.threads.runs.retrieve(
-            thread_id=thread.id, run_id=run.id
-        ).status
-        if status == "completed":
-            break
-        if status == "failed":
-            raise RuntimeError("Assistant run failed")
-        time.sleep(1)
-
-    # Fetch and return reply
-    msgs = client.beta.threads.messages.list(thread_id=thread.id).data
-    assistant_msg = next(m for m in msgs if m.role == "assistant")
-    try:
-        text = assistant_msg.content[0].text.value
-    except Exception:
-        text = assistant_msg.content
-    return text, thread.id
+def analyze_structured(
+    pdf_paths: list[str],
+    api_key: str,
+    assistant_id: str,
+    use_cache: bool = None,
+    on_delta=None,
+    on_progress=None,
+    on_report=None
+) -> tuple[str, str]:
+    """
+    Extract raw line items per PDF as JSON, compute ratios and growth rates
+    locally with pandas, render the table locally and ask the model only for
+    the narrative sections.
+    """
+    client = get_client(api_key)
+
+    # 1) Extract line items from each PDF concurrently
+    total = len(pdf_paths)
+    periods, failures = [], {}
+    done = 0
+    workers = max(1, min(config.map_workers, total))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(bind_current(_extract_line_items), client, api_key, assistant_id, p, use_cache): p
+            for p in pdf_paths
+        }
+        for fut in as_completed(futures):
+            path = futures[fut]
+            done += 1
+            try:
+                items, from_cache = fut.result()
+                periods.extend(items)
+                status = "line items cached" if from_cache else "line items extracted"
+            except JobCancelled:
+                raise
+            except Exception as e:
+                failures[path] = e
+                status = "failed"
+            if on_progress:
+                on_progress(path, status, done, total)
+    if not periods:
+        raise RuntimeError("No line items could be extracted")
+    if failures and on_report:
+        on_report("\n".join(f"{os.path.basename(p)}: left out ({e})" for p, e in failures.items()))
+
+    # 2) Compute derived metrics and render the table locally
+    table = render_table(build_frame(periods))
+    if on_delta:
+        on_delta(table + "\n\n")
+
+    # 3) Narrative sections only
+    thread = _new_thread(client)
+    _add_message(
+        client,
+        thread_id=thread.id,
+        role="user",
+        content=NARRATIVE_PROMPT + table
+    )
+    narrative = _execute_run(client, thread.id, assistant_id, on_delta)
+    return f"{table}\n\n{narrative}", thread.id
+
+def batch_mode(pdf_paths: list[str]) -> str:
+    """
+    The mode analyze_batch runs pdf_paths in within budget: config.analysis_mode,
+    with large file_search batches switched to map-reduce. Results are cached
+    under this mode.
+    """
+    mode = config.analysis_mode
+    if mode == "file_search" and 0 < config.map_reduce_threshold <= len(pdf_paths):
+        mode = "map_reduce"
+    return mode
+
+def analyze_batch(
+    pdf_paths: list[str],
+    api_key: str,
+    assistant_id: str,
+    on_delta=None,
+    on_progress=None,
+    on_report=None
+) -> tuple[str, str, str]:
+    """
+    Run the analysis in batch_mode(pdf_paths); batches over the token budget
+    are refused or downgraded before anything is uploaded. Returns
+    (text, thread_id, mode actually run); a mode other than batch_mode()
+    means a budget downgrade, whose result should not be cached.
+    """
+    mode = _within_budget(pdf_paths, assistant_id, batch_mode(pdf_paths), on_report)
+    if mode == "local":
+        text, tid = analyze_pdfs_locally(pdf_paths, api_key, assistant_id, on_delta=on_delta)
+    elif mode == "structured":
+        text, tid = analyze_structured(
+            pdf_paths, api_key, assistant_id,
+            on_delta=on_delta, on_progress=on_progress, on_report=on_report
+        )
+    elif mode == "map_reduce":
+        text, tid = analyze_map_reduce(
+            pdf_paths, api_key, assistant_id,
+            on_delta=on_delta, on_progress=on_progress, on_report=on_report
+        )
+    else:
+        text, tid = analyze_multiple_pdfs(
+            pdf_paths, api_key, assistant_id,
+            on_delta=on_delta, on_progress=on_progress, on_report=on_report
+        )
+    return text, tid, mode
+
+def chat_with_openai(
+    api_key: str,
+    assistant_id: str,
+    user_message: str,
+    thread_id: str = None,
+    on_delta=None,
+    pdf_paths: list[str] = None
+) -> tuple[str, str]:
+    """
+    Send a plain-text chat message to the Assistants API and return the assistant's reply.
+    pdf_paths (the files the chat is about) only key the usage ledger.
+    """
+    history = sum(m["tokens"] for m in thread_history.get(thread_id).messages) if thread_id else 0
+    estimate = count_tokens(user_message) + min(history, config.chat_context_tokens) + config.budget_reply_tokens
+    reason = usage_ledger.check(estimate)
+    if reason:
+        raise BudgetExceeded(f"Chat refused: {reason}")
+    usage_ledger.record_estimate(estimate, document_set_fingerprint(pdf_paths) if pdf_paths else None,
+                                 assistant_id, "chat")
+    client = get_client(api_key)
+
+    # Create thread (unless continuing one) and send message
+    if thread_id:
+        try:
+            _add_message(
+                client,
+                thread_id=thread_id,
+                role="user",
+                content=user_message
+            )
+        except Exception as e:
+            if getattr(e, "status_code", None) != 404:
+                raise
+            thread_id = None  # cleaned up since; start over
+    if not thread_id:
+        thread_id = _new_thread(client).id
+        _add_message(
+            client,
+            thread_id=thread_id,
+            role="user",
+            content=user_message
+        )
+
+    # Mirror only the new messages and keep the context within budget
+    mirror = thread_history.get(thread_id)
+    mirror.sync(client)
+    def summarize(text):
+        return _summarize(client, assistant_id, text)
+    run_options = mirror.context_options(summarize if config.chat_summarize_dropped else None)
+
+    # Run and return reply
+    task = "chat_short" if count_tokens(user_message) <= config.short_chat_tokens else "chat"
+    text = _execute_run(client, thread_id, assistant_id, on_delta, task=task, **run_options)
+    mirror.sync(client)
+    return text, thread_id
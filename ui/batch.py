@@ -0,0 +1,80 @@
+import os
+import json
+import time
+
+from .config import config
+from .analyzer import analyze_pdf_with_openai, analyze_batch, batch_mode
+from .result_cache import result_cache
+from .jobs import JobCancelled
+
+def cached_analysis(kind: str, pdf_paths: list[str], api_key: str, assistant_id: str,
+                    force: bool = False, **callbacks) -> dict:
+    """
+    Run a "single" or "comparative" analysis through the result cache and
+    return {"text", "thread_id", "mode", "cached", "created_at"}. callbacks
+    (on_delta, on_progress, on_report) go to the analyzer. A budget
+    downgrade is not cached under the full mode's key.
+    """
+    mode = "single" if kind == "single" else batch_mode(pdf_paths)
+    if config.use_result_cache and not force:
+        cached = result_cache.get(pdf_paths, assistant_id, mode)
+        if cached:
+            return {"text": cached["text"], "thread_id": cached["thread_id"], "mode": mode,
+                    "cached": True, "created_at": cached["created_at"]}
+    if kind == "single":
+        callbacks.pop("on_progress", None)
+        text, tid, ran = analyze_pdf_with_openai(pdf_paths[0], api_key, assistant_id, **callbacks), None, mode
+    else:
+        text, tid, ran = analyze_batch(pdf_paths, api_key, assistant_id, **callbacks)
+    if config.use_result_cache and ran == mode:
+        result_cache.put(pdf_paths, assistant_id, text, tid, mode)
+    return {"text": text, "thread_id": tid, "mode": ran, "cached": False, "created_at": time.time()}
+
+def run_analysis(kind: str, pdf_paths: list[str], api_key: str, assistant_id: str,
+                 force: bool = False, on_progress=None) -> dict:
+    """
+    Run a "single" or "comparative" analysis (cached like the GUI unless
+    force) and return a JSON-serializable result record; errors are recorded,
+    not raised, except JobCancelled.
+    """
+    mode = "single" if kind == "single" else batch_mode(pdf_paths)
+    result = {
+        "kind": kind,
+        "files": list(pdf_paths),
+        "assistant_id": assistant_id,
+        "mode": mode,
+        "thread_id": None,
+        "text": None,
+        "cached": False,
+        "error": None,
+        "created_at": time.time(),
+    }
+    started = time.monotonic()
+    try:
+        ran = cached_analysis(kind, pdf_paths, api_key, assistant_id, force, on_progress=on_progress)
+        result.update(text=ran["text"], thread_id=ran["thread_id"], mode=ran["mode"], cached=ran["cached"])
+    except JobCancelled:
+        raise
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+def write_result(out_dir: str, name: str, result: dict, formats=("json", "md")) -> list[str]:
+    """Write result as <name>.json and/or <name>.md under out_dir; returns the paths written."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    if "json" in formats:
+        path = os.path.join(out_dir, name + ".json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        written.append(path)
+    if "md" in formats and result.get("text"):
+        path = os.path.join(out_dir, name + ".md")
+        files = "\n".join(f"- {os.path.basename(p)}" for p in result["files"])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# {result['kind'].title()} analysis\n\n{files}\n\n{result['text']}\n")
+        written.append(path)
+    return written
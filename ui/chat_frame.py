@@ -17,6 +17,20 @@ class ChatFrame(ttk.Labelframe):
         ttk.Button(container, text="Send", command=self._trigger_send, bootstyle="success")\
            .pack(side=tk.RIGHT)
 
+        options = ttk.Frame(self)
+        options.pack(fill=tk.X, padx=5, pady=(0,5))
+        self.ask_anyway = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options, text="Ask anyway (skip cached answers)", variable=self.ask_anyway)\
+           .pack(side=tk.LEFT)
+        self.cache_stats = ttk.Label(options, bootstyle="secondary")
+        self.cache_stats.pack(side=tk.RIGHT)
+
+    def show_cache_stats(self, stats: dict):
+        self.cache_stats.config(
+            text=f"Answer cache: {stats['hits']} hits / {stats['hits'] + stats['misses']} "
+                 f"({stats['hit_rate']:.0%})"
+        )
+
     def _on_enter(self, event):
         self._trigger_send()
         return "break"
@@ -0,0 +1,106 @@
+import threading
+import httpx
+from openai import OpenAI
+
+from .config import config
+from .rate_governor import GovernedTransport, governor
+from .jobs import scheduler
+
+try:
+    from openai import DefaultHttpxClient as _HttpClient
+except ImportError:
+    _HttpClient = httpx.Client
+
+class ClientManager:
+    """
+    Keeps one keep-alive OpenAI client per API key, shared across threads.
+    Clients replaced after a key or settings change are closed once no
+    job is running that could still be using them.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._retired = []
+        self._settings = None
+        scheduler.add_listener(lambda job: self._close_retired())
+
+    def _retire(self, clients):
+        """Queue evicted clients for closing (caller holds the lock)."""
+        self._retired.extend(clients)
+
+    def _close_retired(self):
+        if scheduler.active_count():
+            return
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for client in retired:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def _current_settings(self):
+        return (
+            config.http_pool_size, config.http_timeout, config.http_max_retries,
+            config.use_rate_governor, config.api_base_url
+        )
+
+    def _build(self, api_key: str) -> OpenAI:
+        pool_size, timeout, max_retries, governed, base_url = self._current_settings()
+        limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size
+        )
+        if governed:
+            # Retries happen in the governor so they share one backoff schedule
+            transport = GovernedTransport(httpx.HTTPTransport(limits=limits), governor)
+            http_client = _HttpClient(transport=transport, timeout=timeout)
+            max_retries = 0
+        else:
+            http_client = _HttpClient(limits=limits, timeout=timeout)
+        return OpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            timeout=timeout,
+            max_retries=max_retries,
+            http_client=http_client
+        )
+
+    def get(self, api_key: str) -> OpenAI:
+        """Return the shared client for api_key, building it on first use."""
+        with self._lock:
+            settings = self._current_settings()
+            if settings != self._settings:
+                # In-flight calls keep their old client; new calls get a rebuilt one
+                self._retire(self._clients.values())
+                self._clients = {}
+                self._settings = settings
+            client = self._clients.get(api_key)
+            if client is None:
+                client = self._build(api_key)
+                self._clients[api_key] = client
+        self._close_retired()
+        return client
+
+    def retain(self, api_key: str):
+        """Drop every client except the one for api_key (e.g. after a key change)."""
+        with self._lock:
+            self._retire(c for k, c in self._clients.items() if k != api_key)
+            self._clients = {k: c for k, c in self._clients.items() if k == api_key}
+        self._close_retired()
+
+    def close_all(self):
+        """Close all pooled connections (on application exit)."""
+        with self._lock:
+            for client in list(self._clients.values()) + self._retired:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self._clients.clear()
+            self._retired = []
+
+client_manager = ClientManager()
+
+def get_client(api_key: str) -> OpenAI:
+    return client_manager.get(api_key)
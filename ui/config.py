@@ -23,6 +23,127 @@ class Config:
         self.api_key = ""
         # Saved API Keys
         self.saved_api_keys = {}
+        # Local caches (upload ids, results, ...)
+        self.cache_dir = os.path.join(
+            os.path.dirname(__file__),
+            ".financial_auto_analysis_cache"
+        )
+        # Reuse previously uploaded files instead of calling files.create again
+        self.use_upload_cache = True
+        # Stream run output; fall back to polling with backoff (seconds)
+        self.use_streaming = True
+        self.poll_interval_min = 0.2
+        self.poll_interval_max = 2.0
+        # Shared OpenAI HTTP client: connection pool size, timeout (s), retries
+        self.http_pool_size = 10
+        # Alternative API endpoint (proxy, local stand-in); empty uses the default
+        self.api_base_url = ""
+        self.http_timeout = 120.0
+        self.http_max_retries = 2
+        # Parallel PDF uploads: worker count and per-file retries
+        self.upload_workers = 4
+        self.upload_retries = 2
+        # Background downloads: total workers, connections per host, timeout (s)
+        self.download_workers = 8
+        self.download_per_host = 4
+        self.download_timeout = 60
+        # Listing pages: how many pagination levels to follow, fetch workers
+        self.crawl_max_depth = 3
+        self.crawl_workers = 4
+        # Local PDF text extraction: worker processes (0 = CPU count) and the
+        # pages/s below which a file is flagged as slow in the report
+        self.extract_workers = 0
+        self.extract_slow_pages_per_sec = 5.0
+        # Analysis mode: "file_search" (upload PDFs), "local" (FAISS retrieval)
+        # "map_reduce" (summarize each PDF, then compare the summaries) or
+        # "structured" (JSON line items, ratios and table computed locally)
+        self.analysis_mode = "file_search"
+        # file_search batches of at least this many PDFs use map_reduce (0 = never)
+        self.map_reduce_threshold = 8
+        self.map_workers = 4
+        # Local retrieval: chunk size/overlap (tokens), chunks per document, embedding model
+        self.chunk_tokens = 400
+        self.chunk_overlap = 50
+        self.local_top_k = 8
+        self.embedding_model = "text-embedding-3-small"
+        # Upload only financial-statement pages: keep pages scoring at least
+        # threshold * best page score (lower = higher recall), at most max_pages
+        self.use_page_filter = True
+        self.prefilter_threshold = 0.35
+        self.prefilter_max_pages = 25
+        # Reuse results of identical analyses (same files, prompts, assistant)
+        self.use_result_cache = True
+        self.result_cache_max_mb = 50
+        # Chat answer cache: min cosine similarity, entry TTL, entries per document set
+        self.use_semantic_cache = True
+        self.semantic_cache_threshold = 0.92
+        self.semantic_cache_ttl_hours = 168
+        self.semantic_cache_max_entries = 500
+        # Chat context: token budget for thread history sent to a run; older
+        # turns are truncated and, if enabled, replaced by a running summary
+        self.chat_context_tokens = 6000
+        self.chat_summarize_dropped = True
+        # Analyses and chats run at once by the job scheduler (0 is treated as 1)
+        self.job_workers = 3
+        # Pace API calls to the account's rate limits and retry in one place
+        # (the SDK's own retries are then off); backoff in seconds, 0 = no wait
+        self.use_rate_governor = True
+        self.governor_backoff_base = 1.0
+        self.governor_backoff_max = 30.0
+        # Cancel an assistant run still active after this many seconds (0 = no deadline)
+        self.run_deadline_seconds = 600
+        # Delete tracked threads/files on start once older than max_age_days or
+        # beyond the newest max_* of their kind (0 = no limit)
+        self.gc_on_start = True
+        self.gc_thread_max_age_days = 7
+        self.gc_max_threads = 200
+        self.gc_file_max_age_days = 30
+        self.gc_max_files = 500
+        # Shared analysis service; empty runs everything in-process
+        self.service_url = ""
+        self.service_token = ""
+        self.service_host = "127.0.0.1"
+        self.service_port = 8765
+        self.service_max_upload_mb = 200
+        # Analyze new PDFs in the download directory automatically
+        self.watch_enabled = False
+        self.watch_interval = 30
+        self.watch_settle_seconds = 10
+        self.watch_workers = 2
+        # Append per-stage timing spans to cache_dir/traces/YYYY-MM-DD.jsonl
+        self.trace_enabled = True
+        # Token budgets (0 = unlimited, the default); over budget a batch is
+        # refused, or with "downgrade" run in local mode if that fits. Replies are
+        # estimated at budget_reply_tokens per run; prices are USD per 1M prompt/completion tokens
+        self.budget_job_tokens = 0
+        self.budget_day_tokens = 0
+        self.budget_action = "refuse"
+        self.budget_reply_tokens = 1500
+        self.token_prices = {
+            "default": [2.5, 10.0],
+            "gpt-4o": [2.5, 10.0],
+            "gpt-4o-mini": [0.15, 0.6],
+            "gpt-4.1": [2.0, 8.0],
+            "gpt-4.1-mini": [0.4, 1.6],
+        }
+        # Model routing: each task runs on the "fast" or "strong" tier's model
+        # ("" = the assistant's own model); chats of at most short_chat_tokens
+        # count as "chat_short". route_instructions adds per-task instructions.
+        # Off by default: when on, some tasks no longer run on the assistant's model
+        self.use_model_routing = False
+        self.fast_model = "gpt-4o-mini"
+        self.strong_model = ""
+        self.model_routes = {
+            "single": "strong",
+            "comparison": "strong",
+            "map": "fast",
+            "extract": "fast",
+            "chat": "strong",
+            "chat_short": "fast",
+            "summary": "fast",
+        }
+        self.route_instructions = {}
+        self.short_chat_tokens = 40
         self.config_path = os.path.join(
             os.path.dirname(__file__),
             ".financial_auto_analysis_config.json"
@@ -39,6 +160,83 @@ class Config:
                 )
                 self.assistant_id = data.get("assistant_id", self.assistant_id)
                 self.saved_api_keys = data.get("saved_api_keys", {})
+                self.cache_dir = data.get("cache_dir", self.cache_dir)
+                self.use_upload_cache = data.get("use_upload_cache", self.use_upload_cache)
+                self.use_streaming = data.get("use_streaming", self.use_streaming)
+                self.poll_interval_min = data.get("poll_interval_min", self.poll_interval_min)
+                self.poll_interval_max = data.get("poll_interval_max", self.poll_interval_max)
+                self.http_pool_size = data.get("http_pool_size", self.http_pool_size)
+                self.api_base_url = data.get("api_base_url", self.api_base_url)
+                self.http_timeout = data.get("http_timeout", self.http_timeout)
+                self.http_max_retries = data.get("http_max_retries", self.http_max_retries)
+                self.upload_workers = data.get("upload_workers", self.upload_workers)
+                self.upload_retries = data.get("upload_retries", self.upload_retries)
+                self.download_workers = data.get("download_workers", self.download_workers)
+                self.download_per_host = data.get("download_per_host", self.download_per_host)
+                self.download_timeout = data.get("download_timeout", self.download_timeout)
+                self.crawl_max_depth = data.get("crawl_max_depth", self.crawl_max_depth)
+                self.crawl_workers = data.get("crawl_workers", self.crawl_workers)
+                self.extract_workers = data.get("extract_workers", self.extract_workers)
+                self.extract_slow_pages_per_sec = data.get(
+                    "extract_slow_pages_per_sec", self.extract_slow_pages_per_sec
+                )
+                self.analysis_mode = data.get("analysis_mode", self.analysis_mode)
+                self.map_reduce_threshold = data.get("map_reduce_threshold", self.map_reduce_threshold)
+                self.map_workers = data.get("map_workers", self.map_workers)
+                self.chunk_tokens = data.get("chunk_tokens", self.chunk_tokens)
+                self.chunk_overlap = data.get("chunk_overlap", self.chunk_overlap)
+                self.local_top_k = data.get("local_top_k", self.local_top_k)
+                self.embedding_model = data.get("embedding_model", self.embedding_model)
+                self.use_page_filter = data.get("use_page_filter", self.use_page_filter)
+                self.prefilter_threshold = data.get("prefilter_threshold", self.prefilter_threshold)
+                self.prefilter_max_pages = data.get("prefilter_max_pages", self.prefilter_max_pages)
+                self.use_result_cache = data.get("use_result_cache", self.use_result_cache)
+                self.result_cache_max_mb = data.get("result_cache_max_mb", self.result_cache_max_mb)
+                self.use_semantic_cache = data.get("use_semantic_cache", self.use_semantic_cache)
+                self.semantic_cache_threshold = data.get(
+                    "semantic_cache_threshold", self.semantic_cache_threshold
+                )
+                self.semantic_cache_ttl_hours = data.get(
+                    "semantic_cache_ttl_hours", self.semantic_cache_ttl_hours
+                )
+                self.semantic_cache_max_entries = data.get(
+                    "semantic_cache_max_entries", self.semantic_cache_max_entries
+                )
+                self.chat_context_tokens = data.get("chat_context_tokens", self.chat_context_tokens)
+                self.chat_summarize_dropped = data.get(
+                    "chat_summarize_dropped", self.chat_summarize_dropped
+                )
+                self.job_workers = data.get("job_workers", self.job_workers)
+                self.use_rate_governor = data.get("use_rate_governor", self.use_rate_governor)
+                self.governor_backoff_base = data.get("governor_backoff_base", self.governor_backoff_base)
+                self.governor_backoff_max = data.get("governor_backoff_max", self.governor_backoff_max)
+                self.run_deadline_seconds = data.get("run_deadline_seconds", self.run_deadline_seconds)
+                self.gc_on_start = data.get("gc_on_start", self.gc_on_start)
+                self.gc_thread_max_age_days = data.get("gc_thread_max_age_days", self.gc_thread_max_age_days)
+                self.gc_max_threads = data.get("gc_max_threads", self.gc_max_threads)
+                self.gc_file_max_age_days = data.get("gc_file_max_age_days", self.gc_file_max_age_days)
+                self.gc_max_files = data.get("gc_max_files", self.gc_max_files)
+                self.service_url = data.get("service_url", self.service_url)
+                self.service_token = data.get("service_token", self.service_token)
+                self.service_host = data.get("service_host", self.service_host)
+                self.service_port = data.get("service_port", self.service_port)
+                self.service_max_upload_mb = data.get("service_max_upload_mb", self.service_max_upload_mb)
+                self.watch_enabled = data.get("watch_enabled", self.watch_enabled)
+                self.watch_interval = data.get("watch_interval", self.watch_interval)
+                self.watch_settle_seconds = data.get("watch_settle_seconds", self.watch_settle_seconds)
+                self.watch_workers = data.get("watch_workers", self.watch_workers)
+                self.trace_enabled = data.get("trace_enabled", self.trace_enabled)
+                self.budget_job_tokens = data.get("budget_job_tokens", self.budget_job_tokens)
+                self.budget_day_tokens = data.get("budget_day_tokens", self.budget_day_tokens)
+                self.budget_action = data.get("budget_action", self.budget_action)
+                self.budget_reply_tokens = data.get("budget_reply_tokens", self.budget_reply_tokens)
+                self.token_prices = data.get("token_prices", self.token_prices)
+                self.use_model_routing = data.get("use_model_routing", self.use_model_routing)
+                self.fast_model = data.get("fast_model", self.fast_model)
+                self.strong_model = data.get("strong_model", self.strong_model)
+                self.model_routes = data.get("model_routes", self.model_routes)
+                self.route_instructions = data.get("route_instructions", self.route_instructions)
+                self.short_chat_tokens = data.get("short_chat_tokens", self.short_chat_tokens)
         except Exception:
             pass
 
@@ -47,7 +245,74 @@ class Config:
         data = {
             "default_download_dir": self.default_download_dir,
             "assistant_id": self.assistant_id,
-            "saved_api_keys": self.saved_api_keys
+            "saved_api_keys": self.saved_api_keys,
+            "cache_dir": self.cache_dir,
+            "use_upload_cache": self.use_upload_cache,
+            "use_streaming": self.use_streaming,
+            "poll_interval_min": self.poll_interval_min,
+            "poll_interval_max": self.poll_interval_max,
+            "http_pool_size": self.http_pool_size,
+            "api_base_url": self.api_base_url,
+            "http_timeout": self.http_timeout,
+            "http_max_retries": self.http_max_retries,
+            "upload_workers": self.upload_workers,
+            "upload_retries": self.upload_retries,
+            "download_workers": self.download_workers,
+            "download_per_host": self.download_per_host,
+            "download_timeout": self.download_timeout,
+            "crawl_max_depth": self.crawl_max_depth,
+            "crawl_workers": self.crawl_workers,
+            "extract_workers": self.extract_workers,
+            "extract_slow_pages_per_sec": self.extract_slow_pages_per_sec,
+            "analysis_mode": self.analysis_mode,
+            "map_reduce_threshold": self.map_reduce_threshold,
+            "map_workers": self.map_workers,
+            "chunk_tokens": self.chunk_tokens,
+            "chunk_overlap": self.chunk_overlap,
+            "local_top_k": self.local_top_k,
+            "embedding_model": self.embedding_model,
+            "use_page_filter": self.use_page_filter,
+            "prefilter_threshold": self.prefilter_threshold,
+            "prefilter_max_pages": self.prefilter_max_pages,
+            "use_result_cache": self.use_result_cache,
+            "result_cache_max_mb": self.result_cache_max_mb,
+            "use_semantic_cache": self.use_semantic_cache,
+            "semantic_cache_threshold": self.semantic_cache_threshold,
+            "semantic_cache_ttl_hours": self.semantic_cache_ttl_hours,
+            "semantic_cache_max_entries": self.semantic_cache_max_entries,
+            "chat_context_tokens": self.chat_context_tokens,
+            "chat_summarize_dropped": self.chat_summarize_dropped,
+            "job_workers": self.job_workers,
+            "use_rate_governor": self.use_rate_governor,
+            "governor_backoff_base": self.governor_backoff_base,
+            "governor_backoff_max": self.governor_backoff_max,
+            "run_deadline_seconds": self.run_deadline_seconds,
+            "gc_on_start": self.gc_on_start,
+            "gc_thread_max_age_days": self.gc_thread_max_age_days,
+            "gc_max_threads": self.gc_max_threads,
+            "gc_file_max_age_days": self.gc_file_max_age_days,
+            "gc_max_files": self.gc_max_files,
+            "service_url": self.service_url,
+            "service_token": self.service_token,
+            "service_host": self.service_host,
+            "service_port": self.service_port,
+            "service_max_upload_mb": self.service_max_upload_mb,
+            "watch_enabled": self.watch_enabled,
+            "watch_interval": self.watch_interval,
+            "watch_settle_seconds": self.watch_settle_seconds,
+            "watch_workers": self.watch_workers,
+            "trace_enabled": self.trace_enabled,
+            "budget_job_tokens": self.budget_job_tokens,
+            "budget_day_tokens": self.budget_day_tokens,
+            "budget_action": self.budget_action,
+            "budget_reply_tokens": self.budget_reply_tokens,
+            "token_prices": self.token_prices,
+            "use_model_routing": self.use_model_routing,
+            "fast_model": self.fast_model,
+            "strong_model": self.strong_model,
+            "model_routes": self.model_routes,
+            "route_instructions": self.route_instructions,
+            "short_chat_tokens": self.short_chat_tokens
         }
         try:
             with open(self.config_path, "w", encoding="utf-8") as f:
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import threading
+
+from .config import config
+
+class CrawlManifest:
+    """
+    Persistent record of every fetched PDF URL with its validators
+    (ETag / Last-Modified), size and content hash.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+        except Exception:
+            self._entries = {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return url in self._entries
+
+    def get(self, url: str):
+        with self._lock:
+            return self._entries.get(url)
+
+    def conditional_headers(self, url: str, dest: str) -> dict:
+        """Validators for a conditional GET, if we still have a local copy."""
+        entry = self.get(url)
+        if not entry or not os.path.exists(dest):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, url: str, dest: str, etag=None, last_modified=None, size=None, sha256=None):
+        """Store the latest validators for url; return True if the content changed."""
+        with self._lock:
+            prev = self._entries.get(url, {})
+            self._entries[url] = {
+                "path": dest,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": size,
+                "sha256": sha256,
+                "fetched_at": time.time(),
+            }
+            self._save()
+        return prev.get("sha256") != sha256
+
+    def touch(self, url: str):
+        """Mark url as checked (e.g. after a 304)."""
+        with self._lock:
+            if url in self._entries:
+                self._entries[url]["fetched_at"] = time.time()
+                self._save()
+
+crawl_manifest = CrawlManifest(os.path.join(config.cache_dir, "crawl_manifest.json"))
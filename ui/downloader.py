@@ -0,0 +1,150 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import config
+from .upload_cache import file_sha256
+
+class DownloadManager:
+    """
+    Background PDF downloader: pooled session, bounded concurrency per host,
+    chunked writes to a .part file, Range resume (guarded by If-Range with
+    the validators saved next to the .part) and atomic rename.
+    With a manifest, files we already have are re-fetched with a conditional GET.
+    """
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, max_workers: int = None, per_host: int = None, manifest=None):
+        self.manifest = manifest
+        self.max_workers = max_workers or config.download_workers
+        self.per_host = per_host or config.download_per_host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._host_locks = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_locks:
+                self._host_locks[host] = threading.Semaphore(self.per_host)
+            return self._host_locks[host]
+
+    def download(self, url: str, dest: str, on_progress=None) -> str:
+        """
+        Download url to dest, resuming from dest + '.part' if present.
+        on_progress(received, total) is called per chunk; total may be None.
+        Returns "downloaded", or "unchanged" if the remote file has not changed.
+        """
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        part = dest + ".part"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if_range = self._load_validator(part) if offset else None
+        if offset and not if_range:
+            # No validator to prove the remote file is unchanged; start over
+            offset = 0
+        if offset:
+            headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+        elif self.manifest is not None:
+            headers = self.manifest.conditional_headers(url, dest)
+        else:
+            headers = {}
+
+        with self._host_slot(url):
+            with self.session.get(url, headers=headers, stream=True,
+                                  timeout=config.download_timeout) as resp:
+                if resp.status_code == 304:
+                    self.manifest.touch(url)
+                    return "unchanged"
+                validators = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+                if resp.status_code == 416:
+                    # Range not satisfiable: either .part is already complete
+                    # or the remote file changed, in which case start over
+                    size = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                    if not (size.isdigit() and int(size) == offset):
+                        os.remove(part)
+                        restart = True
+                    else:
+                        restart = False
+                else:
+                    resp.raise_for_status()
+                    if resp.status_code != 206:
+                        # Full body: a fresh download, or If-Range saw a changed file
+                        self._save_validator(part, validators)
+                    self._write(resp, part, offset, on_progress)
+                    restart = False
+        if restart:
+            self._remove_validator(part)
+            return self.download(url, dest, on_progress)
+        os.replace(part, dest)
+        self._remove_validator(part)
+        if self.manifest is None:
+            return "downloaded"
+        changed = self.manifest.record(
+            url, dest,
+            etag=validators[0],
+            last_modified=validators[1],
+            size=os.path.getsize(dest),
+            sha256=file_sha256(dest)
+        )
+        return "downloaded" if changed else "unchanged"
+
+    @staticmethod
+    def _load_validator(part: str):
+        """The strong ETag or Last-Modified of the response that started part, for If-Range."""
+        try:
+            with open(part + ".validators", "r", encoding="utf-8") as f:
+                etag, last_modified = json.load(f)
+        except Exception:
+            return None
+        if etag and not etag.startswith("W/"):
+            return etag
+        return last_modified
+
+    @staticmethod
+    def _save_validator(part: str, validators: tuple):
+        try:
+            with open(part + ".validators", "w", encoding="utf-8") as f:
+                json.dump(list(validators), f)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove_validator(part: str):
+        try:
+            os.remove(part + ".validators")
+        except OSError:
+            pass
+
+    def _write(self, resp, part: str, offset: int, on_progress=None):
+        """Stream the response body into part, appending if the server honoured Range."""
+        if resp.status_code != 206:
+            offset = 0
+        length = resp.headers.get("Content-Length")
+        total = offset + int(length) if length else None
+        received = offset
+        with open(part, "ab" if offset else "wb") as f:
+            for chunk in resp.iter_content(chunk_size=self.CHUNK_SIZE):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                received += len(chunk)
+                if on_progress:
+                    on_progress(received, total)
+        if total is not None and received < total:
+            raise IOError(f"Incomplete download ({received}/{total} bytes)")
+
+    def submit(self, url: str, dest: str, on_progress=None):
+        """Queue a download and return its Future."""
+        return self._pool.submit(self.download, url, dest, on_progress)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
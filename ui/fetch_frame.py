@@ -1,11 +1,12 @@
 import os
+import threading
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import ttkbootstrap as ttk
-import requests
-from urllib.parse import urlparse, unquote
-from bs4 import BeautifulSoup
 from .config import config
+from .link_extractor import crawl_pdf_links
+from .downloader import DownloadManager
+from .crawl_manifest import crawl_manifest
 
 class FetchFrame:
     def __init__(self, parent, go_back):
@@ -46,6 +47,18 @@ class FetchFrame:
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         sb.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Download progress
+        self.downloader = None
+        self.pending = 0
+        self.failed = 0
+        dl = ttk.Labelframe(self.frame, text="Downloads")
+        dl.pack(fill=tk.X, padx=20, pady=(0,10))
+        self.download_view = ttk.Treeview(dl, columns=("file", "status"), show="headings", height=5)
+        self.download_view.heading("file", text="File")
+        self.download_view.heading("status", text="Status")
+        self.download_view.column("status", width=160, stretch=False)
+        self.download_view.pack(fill=tk.X, padx=5, pady=5)
+
         spacer_height = 30
         ttk.Frame(self.frame, height=spacer_height).pack(fill=tk.X)
 
@@ -54,29 +67,28 @@ class FetchFrame:
         if not url:
             messagebox.showwarning("Warning", "Enter a URL.")
             return
+        session = self._get_downloader().session
+        threading.Thread(target=self._crawl, args=(url, session), daemon=True).start()
+
+    def _crawl(self, url, session):
         try:
-            resp = requests.get(url)
-            resp.raise_for_status()
+            found = crawl_pdf_links(url, session=session)
         except Exception as e:
-            messagebox.showerror("Error", f"Fetch failed: {e}")
+            msg = f"Fetch failed: {e}"
+            self.frame.after(0, lambda: messagebox.showerror("Error", msg))
             return
+        self.frame.after(0, lambda: self._set_pdf_urls(found))
 
-        soup = BeautifulSoup(resp.text, 'html.parser')
+    def _set_pdf_urls(self, found):
         self.pdf_urls.clear()
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if not href.lower().endswith('.pdf'):
-                continue
-            full = href if href.startswith('http') else requests.compat.urljoin(url, href)
-            parsed = urlparse(full)
-            raw = os.path.basename(parsed.path)
-            name = unquote(raw).replace('+',' ')
-            tag = a.find_previous(['h2','h3'])
-            section = tag.get_text(strip=True) if tag else 'Uncategorized'
-            self.pdf_urls.setdefault(section, {})[name] = full
-
+        self.pdf_urls.update(found)
         self._rebuild()
 
+    def _get_downloader(self):
+        if self.downloader is None:
+            self.downloader = DownloadManager(manifest=crawl_manifest)
+        return self.downloader
+
     def _rebuild(self):
         for widget in self.list_frame.winfo_children():
             widget.destroy()
@@ -85,9 +97,14 @@ class FetchFrame:
             ttk.Label(self.list_frame, text=section, bootstyle="secondary")\
                 .pack(anchor="w", pady=(5,0))
             for filename, url in files.items():
+                is_new = url not in crawl_manifest
                 var = tk.BooleanVar()
-                ttk.Checkbutton(self.list_frame, text=filename, variable=var)\
-                    .pack(anchor="w", padx=10)
+                ttk.Checkbutton(
+                    self.list_frame,
+                    text=f"{filename}  [new]" if is_new else filename,
+                    variable=var,
+                    bootstyle="success" if is_new else "default"
+                ).pack(anchor="w", padx=10)
                 self.check_vars[(section, filename)] = var
 
     def download_selected(self):
@@ -102,16 +119,55 @@ class FetchFrame:
         else:
             base_dir = config.default_download_dir
 
-        for (section, filename), var in self.check_vars.items():
-            if var.get():
-                file_url = self.pdf_urls[section][filename]
-                folder = os.path.join(base_dir, section)
-                os.makedirs(folder, exist_ok=True)
-                try:
-                    response = requests.get(file_url)
-                    response.raise_for_status()
-                    with open(os.path.join(folder, filename), 'wb') as f:
-                        f.write(response.content)
-                except Exception as e:
-                    messagebox.showerror("Error", f"{filename}: {e}")
-        messagebox.showinfo("Done", "Downloads complete.")
+        selected = [key for key, var in self.check_vars.items() if var.get()]
+        if not selected:
+            messagebox.showwarning("Warning", "Nothing selected.")
+            return
+        downloader = self._get_downloader()
+
+        self.download_view.delete(*self.download_view.get_children())
+        self.pending += len(selected)
+        for section, filename in selected:
+            iid = self.download_view.insert("", tk.END, values=(filename, "queued"))
+            dest = os.path.join(base_dir, section, filename)
+            future = downloader.submit(
+                self.pdf_urls[section][filename],
+                dest,
+                on_progress=self._progress_callback(iid)
+            )
+            future.add_done_callback(
+                lambda fut, iid=iid: self.frame.after(0, lambda: self._on_download_done(iid, fut))
+            )
+
+    def _progress_callback(self, iid):
+        """Throttle per-chunk progress to one UI update per percent."""
+        last = [None]
+        def on_progress(received, total):
+            if total:
+                status = f"{received * 100 // total}%"
+            else:
+                status = f"{received // 1024} KB"
+            if status != last[0]:
+                last[0] = status
+                self.frame.after(0, lambda: self._set_download_status(iid, status))
+        return on_progress
+
+    def _set_download_status(self, iid, status):
+        if self.download_view.exists(iid):
+            self.download_view.set(iid, "status", status)
+
+    def _on_download_done(self, iid, future):
+        self.pending -= 1
+        if future.cancelled():
+            self._set_download_status(iid, "cancelled")
+        elif future.exception():
+            self.failed += 1
+            self._set_download_status(iid, f"failed: {future.exception()}")
+        else:
+            self._set_download_status(iid, future.result())
+        if self.pending == 0:
+            failed, self.failed = self.failed, 0
+            if failed:
+                messagebox.showwarning("Done", f"Downloads finished with {failed} failure(s).")
+            else:
+                messagebox.showinfo("Done", "Downloads complete.")
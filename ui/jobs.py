@@ -0,0 +1,180 @@
+import time
+import queue
+import itertools
+import threading
+
+from .config import config
+
+# Lower runs first
+PRIORITY_CHAT = 0
+PRIORITY_ANALYSIS = 10
+PRIORITY_BACKGROUND = 20
+
+# Finished jobs kept in scheduler.jobs (oldest are forgotten first)
+MAX_FINISHED_JOBS = 200
+
+class JobCancelled(Exception):
+    pass
+
+_local = threading.local()
+
+def current_job():
+    """The Job being executed by the calling thread, if any."""
+    return getattr(_local, "job", None)
+
+def bind_current(fn):
+    """Wrap fn so it runs under the caller's job (for helper thread pools)."""
+    job = current_job()
+    def wrapper(*args, **kwargs):
+        prev = current_job()
+        _local.job = job
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.job = prev
+    return wrapper
+
+def check_cancelled():
+    """Raise JobCancelled if the current job has been cancelled."""
+    job = current_job()
+    if job is not None and job.cancel_event.is_set():
+        raise JobCancelled(f"{job.name} was cancelled")
+
+class Job:
+    def __init__(self, job_id: int, name: str, fn, priority: int):
+        self.id = job_id
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.state = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def attach_run(self, client, thread_id: str, run_id: str):
+        """Register a remote run so cancelling the job also cancels it server-side."""
+        with self._lock:
+            self._runs[run_id] = (client, thread_id)
+        if self.cancel_event.is_set():
+            self._cancel_runs()
+
+    def detach_run(self, run_id: str):
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def _cancel_runs(self):
+        with self._lock:
+            runs, self._runs = self._runs, {}
+        for run_id, (client, thread_id) in runs.items():
+            try:
+                client.beta.threads.runs.cancel(run_id=run_id, thread_id=thread_id)
+            except Exception:
+                pass
+
+class JobScheduler:
+    """
+    Bounded worker pool with a priority queue; jobs can be cancelled while
+    queued or running. Listeners are called (from worker threads) on every
+    state change.
+    """
+    def __init__(self, workers: int = None):
+        self.workers = max(1, workers or config.job_workers)
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.jobs = {}
+        self._listeners = []
+        self._threads = []
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._worker, daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _notify(self, job):
+        for callback in list(self._listeners):
+            try:
+                callback(job)
+            except Exception:
+                pass
+
+    def submit(self, fn, name: str, priority: int = PRIORITY_ANALYSIS) -> Job:
+        """Queue fn() to run on a worker; returns its Job."""
+        job = Job(next(self._ids), name, fn, priority)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self._queue.put((priority, next(self._seq), job))
+        self._ensure_workers()
+        self._notify(job)
+        return job
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS (caller holds the lock)."""
+        finished = [j for j in self.jobs.values() if j.state in ("done", "failed", "cancelled")]
+        finished.sort(key=lambda j: j.finished_at or 0)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    def cancel(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None or job.state in ("done", "failed", "cancelled"):
+            return
+        job.cancel_event.set()
+        if job.state == "queued":
+            job.state = "cancelled"
+            job.finished_at = time.time()
+            self._notify(job)
+        else:
+            job._cancel_runs()
+
+    def active_count(self) -> int:
+        return sum(1 for j in list(self.jobs.values()) if j.state in ("queued", "running"))
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job.cancel_event.is_set():
+                continue
+            job.state = "running"
+            job.started_at = time.time()
+            self._notify(job)
+            _local.job = job
+            try:
+                job.result = job.fn()
+                job.state = "cancelled" if job.cancel_event.is_set() else "done"
+            except JobCancelled:
+                job.state = "cancelled"
+            except Exception as e:
+                job.error = e
+                job.state = "cancelled" if job.cancel_event.is_set() else "failed"
+            finally:
+                _local.job = None
+                job.finished_at = time.time()
+                job._cancel_runs()
+                self._notify(job)
+
+scheduler = JobScheduler()
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import threading
+
+from .config import config
+from .upload_cache import key_namespace, upload_cache
+
+KINDS = ("thread", "vector_store", "file")
+
+def _is_not_found(e) -> bool:
+    return getattr(e, "status_code", None) == 404
+
+def _vector_stores(client):
+    # Moved out of beta in newer SDKs
+    return getattr(client, "vector_stores", None) or client.beta.vector_stores
+
+class ResourceTracker:
+    """
+    Persistent record of every file, thread and vector store the app creates,
+    per account, so orphans can be deleted by age or count.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+        except Exception:
+            self._entries = {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def track(self, client, kind: str, resource_id: str):
+        """Record a created resource; keeps the first creation time if already known."""
+        with self._lock:
+            entries = self._entries.setdefault(key_namespace(client.api_key), {})
+            if resource_id not in entries:
+                entries[resource_id] = {"kind": kind, "created_at": time.time()}
+                self._save()
+
+    def forget(self, client, resource_id: str):
+        with self._lock:
+            if self._entries.get(key_namespace(client.api_key), {}).pop(resource_id, None):
+                self._save()
+
+    def entries(self, client) -> dict:
+        with self._lock:
+            return dict(self._entries.get(key_namespace(client.api_key), {}))
+
+    def _policy(self, kind: str):
+        if kind == "file":
+            return config.gc_file_max_age_days, config.gc_max_files
+        return config.gc_thread_max_age_days, config.gc_max_threads
+
+    def _expired(self, client, protect) -> list[tuple[str, str]]:
+        """(kind, id) pairs that are over the age limit or beyond the count limit."""
+        now = time.time()
+        doomed = []
+        by_kind = {k: [] for k in KINDS}
+        for rid, entry in self.entries(client).items():
+            if rid not in protect:
+                by_kind.setdefault(entry["kind"], []).append((entry["created_at"], rid))
+        for kind, items in by_kind.items():
+            max_age, max_count = self._policy(kind)
+            items.sort(reverse=True)  # newest first
+            for i, (created_at, rid) in enumerate(items):
+                too_old = max_age and now - created_at > max_age * 86400
+                too_many = max_count and i >= max_count
+                if too_old or too_many:
+                    doomed.append((kind, rid))
+        # Threads first: their vector stores are deleted along with them
+        return sorted(doomed, key=lambda d: KINDS.index(d[0]) if d[0] in KINDS else len(KINDS))
+
+    def _delete(self, client, kind: str, resource_id: str) -> int:
+        """Delete one resource; returns how many thread vector stores went with it."""
+        stores_deleted = 0
+        if kind == "thread":
+            # Attaching files to messages creates a vector store owned by the thread
+            try:
+                thread = client.beta.threads.retrieve(resource_id)
+                stores = thread.tool_resources.file_search.vector_store_ids or []
+            except Exception:
+                stores = []
+            for store_id in stores:
+                try:
+                    _vector_stores(client).delete(store_id)
+                except Exception as e:
+                    if not _is_not_found(e):
+                        self.track(client, "vector_store", store_id)  # retry next pass
+                        continue
+                self.forget(client, store_id)
+                stores_deleted += 1
+            client.beta.threads.delete(resource_id)
+        elif kind == "vector_store":
+            _vector_stores(client).delete(resource_id)
+        elif kind == "file":
+            upload_cache.evict_file_id(resource_id)
+            client.files.delete(resource_id)
+        return stores_deleted
+
+    def gc(self, client, protect=()) -> dict:
+        """
+        Delete tracked resources outside the configured age/count policy,
+        skipping ids in protect. Returns counts per kind plus failures.
+        """
+        counts = {k: 0 for k in KINDS}
+        counts["failed"] = 0
+        for kind, rid in self._expired(client, set(protect)):
+            try:
+                counts["vector_store"] += self._delete(client, kind, rid)
+            except Exception as e:
+                if not _is_not_found(e):
+                    counts["failed"] += 1
+                    continue
+            self.forget(client, rid)
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+resource_tracker = ResourceTracker(os.path.join(config.cache_dir, "resources.json"))
@@ -0,0 +1,161 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlparse, unquote, urljoin
+import requests
+
+from .config import config
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+HEADINGS = ("h2", "h3")
+NEXT_LABELS = {"next", "next page", "next »", "›", "»", ">", ">>"}
+
+class _LinkCollector:
+    """
+    Parser target that tracks the current h2/h3 heading in one forward pass
+    and collects PDF links under it, plus links to further listing pages.
+    """
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.section = "Uncategorized"
+        self.pdfs = []
+        self.pages = []
+        self._heading = None
+        self._heading_links = []
+        self._anchor = None
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if tag in HEADINGS:
+            self._heading = []
+            self._heading_links = []
+        elif tag == "a" and attrs.get("href"):
+            self._anchor = {
+                "href": attrs["href"],
+                "rel": (attrs.get("rel") or "").lower(),
+                "label": (attrs.get("aria-label") or "").lower(),
+                "text": [],
+            }
+
+    def data(self, text):
+        if self._heading is not None:
+            self._heading.append(text)
+        if self._anchor is not None:
+            self._anchor["text"].append(text)
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in HEADINGS and self._heading is not None:
+            # Same text as BeautifulSoup's get_text(strip=True)
+            self.section = "".join(t.strip() for t in self._heading)
+            for link in self._heading_links:
+                link[0] = self.section
+            self._heading = None
+        elif tag == "a" and self._anchor is not None:
+            self._finish_anchor(self._anchor)
+            self._anchor = None
+
+    def close(self):
+        return self
+
+    def _finish_anchor(self, anchor):
+        href = anchor["href"]
+        if href.lower().endswith(".pdf"):
+            full = href if href.startswith("http") else urljoin(self.base_url, href)
+            raw = os.path.basename(urlparse(full).path)
+            name = unquote(raw).replace("+", " ")
+            link = [self.section, name, full]
+            if self._heading is not None:
+                # Anchor inside a heading belongs to that heading
+                self._heading_links.append(link)
+            self.pdfs.append(link)
+            return
+        text = "".join(anchor["text"]).strip().lower()
+        is_next = "next" in anchor["rel"].split() or text in NEXT_LABELS or anchor["label"] in NEXT_LABELS
+        is_page_number = text.isdigit() and "page" in href.lower()
+        if is_next or is_page_number:
+            self.pages.append(urljoin(self.base_url, href))
+
+class _StdlibParser(HTMLParser):
+    """Adapts html.parser callbacks to the lxml target interface."""
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+def extract_links(html: str, base_url: str):
+    """
+    Return (pdfs, pages) for one page, where pdfs is a list of
+    (section, filename, url) in document order and pages lists pagination URLs.
+    Uses lxml's event parser when installed, html.parser otherwise.
+    """
+    collector = _LinkCollector(base_url)
+    if LXML_AVAILABLE:
+        parser = etree.HTMLParser(target=collector)
+        parser.feed(html)
+        parser.close()
+    else:
+        parser = _StdlibParser(collector)
+        parser.feed(html)
+        parser.close()
+    return [tuple(link) for link in collector.pdfs], collector.pages
+
+def crawl_pdf_links(url: str, session=None, max_depth: int = None, workers: int = None) -> dict:
+    """
+    Collect PDF links from url and, up to max_depth levels, from the pagination
+    pages it links to on the same host. Pages of one level are fetched
+    concurrently. Returns {section: {filename: url}}.
+    """
+    session = session or requests.Session()
+    max_depth = config.crawl_max_depth if max_depth is None else max_depth
+    workers = workers or config.crawl_workers
+    host = urlparse(url).netloc
+
+    def fetch(page_url):
+        try:
+            resp = session.get(page_url, timeout=config.download_timeout)
+            resp.raise_for_status()
+            return resp.text
+        except Exception:
+            if page_url == url:
+                raise
+            return None
+
+    result = {}
+    visited = {url}
+    level = [url]
+    depth = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while level:
+            next_level = []
+            for page_url, html in zip(level, pool.map(fetch, level)):
+                if html is None:
+                    continue
+                pdfs, pages = extract_links(html, page_url)
+                for section, name, full in pdfs:
+                    result.setdefault(section, {})[name] = full
+                if depth < max_depth:
+                    for p in pages:
+                        if urlparse(p).netloc == host and p not in visited:
+                            visited.add(p)
+                            next_level.append(p)
+            level = next_level
+            depth += 1
+    return result
@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+import faiss
+import tiktoken
+
+from .config import config
+from .client_manager import get_client
+from .pdf_text import extract_texts
+
+# Queries used to pull the financial-statement chunks the analysis prompts ask for
+DEFAULT_QUERIES = (
+    "income statement revenue gross profit operating income net income",
+    "balance sheet total assets total liabilities shareholders equity",
+    "cash flow statement operating investing financing activities",
+    "earnings per share EPS dividends key performance indicators",
+)
+
+def chunk_pages(pages: list[str], chunk_tokens: int = None, overlap: int = None) -> list[dict]:
+    """
+    Split page texts into token windows. Chunks never span pages so each
+    one can be cited by page number.
+    """
+    chunk_tokens = chunk_tokens or config.chunk_tokens
+    overlap = config.chunk_overlap if overlap is None else overlap
+    step = max(1, chunk_tokens - overlap)
+    enc = tiktoken.get_encoding("cl100k_base")
+    chunks = []
+    for page_no, text in enumerate(pages, start=1):
+        tokens = enc.encode(text)
+        for start in range(0, len(tokens), step):
+            window = tokens[start:start + chunk_tokens]
+            if not window:
+                break
+            chunks.append({"page": page_no, "text": enc.decode(window)})
+            if start + chunk_tokens >= len(tokens):
+                break
+    return chunks
+
+class HashEmbedder:
+    """
+    Deterministic bag-of-words embedder (feature hashing). Needs no network,
+    so it is suitable for tests and offline use.
+    """
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.id = f"hash-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                h = int.from_bytes(hashlib.md5(word.encode()).digest()[:8], "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return out
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI embeddings endpoint, sent in batches."""
+    BATCH = 256
+
+    def __init__(self, api_key: str, model: str = None):
+        self.client = get_client(api_key)
+        self.model = model or config.embedding_model
+        self.id = self.model
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.BATCH):
+            resp = self.client.embeddings.create(model=self.model, input=texts[i:i + self.BATCH])
+            vectors.extend(d.embedding for d in resp.data)
+        return np.asarray(vectors, dtype="float32")
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+class DocumentIndex:
+    """
+    Persistent FAISS index of one document's chunks (cosine similarity),
+    with incremental add/remove by chunk id.
+    """
+    def __init__(self, directory: str, embedder):
+        self.directory = directory
+        self.embedder = embedder
+        self.index = None
+        self.chunks = {}
+        self.next_id = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.directory, "index.faiss")
+
+    @property
+    def _chunks_path(self):
+        return os.path.join(self.directory, "chunks.json")
+
+    def _load(self):
+        try:
+            if os.path.exists(self._index_path) and os.path.exists(self._chunks_path):
+                self.index = faiss.read_index(self._index_path)
+                with open(self._chunks_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.chunks = {int(k): v for k, v in data["chunks"].items()}
+                self.next_id = data["next_id"]
+        except Exception:
+            self.index, self.chunks, self.next_id = None, {}, 0
+
+    def save(self):
+        with self._lock:
+            if self.index is None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            faiss.write_index(self.index, self._index_path)
+            tmp = self._chunks_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"next_id": self.next_id, "chunks": self.chunks}, f, ensure_ascii=False)
+            os.replace(tmp, self._chunks_path)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add(self, chunks: list[dict], vectors: np.ndarray = None) -> list[int]:
+        """Embed (unless vectors are given) and add chunks; return their ids."""
+        if not chunks:
+            return []
+        if vectors is None:
+            vectors = self.embedder.embed([c["text"] for c in chunks])
+        vectors = _normalize(vectors)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            ids = np.arange(self.next_id, self.next_id + len(chunks), dtype="int64")
+            self.index.add_with_ids(vectors, ids)
+            for chunk_id, chunk in zip(ids.tolist(), chunks):
+                self.chunks[chunk_id] = chunk
+            self.next_id += len(chunks)
+        return ids.tolist()
+
+    def remove(self, ids: list[int]) -> int:
+        """Remove chunks by id; return how many were removed."""
+        with self._lock:
+            if self.index is None or not ids:
+                return 0
+            removed = self.index.remove_ids(np.asarray(ids, dtype="int64"))
+            for chunk_id in ids:
+                self.chunks.pop(chunk_id, None)
+            return removed
+
+    def search(self, query_vectors: np.ndarray, k: int) -> list[tuple[float, dict]]:
+        """Best k chunks for any of the query vectors, highest score first."""
+        with self._lock:
+            if self.index is None or not self.chunks:
+                return []
+            scores, ids = self.index.search(_normalize(query_vectors), min(k, len(self.chunks)))
+        best = {}
+        for row_scores, row_ids in zip(scores, ids):
+            for score, chunk_id in zip(row_scores.tolist(), row_ids.tolist()):
+                if chunk_id in self.chunks and score > best.get(chunk_id, -2.0):
+                    best[chunk_id] = score
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [(score, self.chunks[chunk_id]) for chunk_id, score in ranked]
+
+def index_dir(sha: str, embedder) -> str:
+    params = f"{embedder.id}-{config.chunk_tokens}-{config.chunk_overlap}"
+    return os.path.join(config.cache_dir, "faiss", f"{sha}-{hashlib.sha256(params.encode()).hexdigest()[:12]}")
+
+def load_indexes(pdf_paths: list[str], embedder) -> dict:
+    """
+    Return {path: DocumentIndex}, building and persisting the index for any
+    document that has not been indexed with this embedder yet.
+    """
+    texts = extract_texts(pdf_paths)
+    indexes = {}
+    for path in pdf_paths:
+        result = texts[path]
+        if "error" in result:
+            raise RuntimeError(f"Text extraction failed for {os.path.basename(path)}: {result['error']}")
+        doc = DocumentIndex(index_dir(result["sha256"], embedder), embedder)
+        if not len(doc):
+            doc.add(chunk_pages(result["pages"]))
+            doc.save()
+        indexes[path] = doc
+    return indexes
+
+def retrieve_context(pdf_paths: list[str], embedder, queries=DEFAULT_QUERIES, k: int = None) -> str:
+    """
+    Build a prompt context block with the top-k chunks of every document,
+    each document under its own header and chunks in page order.
+    """
+    k = k or config.local_top_k
+    query_vectors = embedder.embed(list(queries))
+    blocks = []
+    for path, doc in load_indexes(pdf_paths, embedder).items():
+        hits = sorted((c for _, c in doc.search(query_vectors, k)), key=lambda c: c["page"])
+        body = "\n\n".join(f"[page {c['page']}]\n{c['text']}" for c in hits)
+        blocks.append(f"=== Document: {os.path.basename(path)} ===\n{body}")
+    return "\n\n".join(blocks)
@@ -100,3 +100,4 @@ class MainApp:
 
             self.analysis.api_key = api_key
             self.analysis.assistant_id = assistant_id
+            self.analysis.update_watcher()
@@ -0,0 +1,170 @@
+import re
+import json
+import pandas as pd
+
+# Raw line items requested from the model, in table order
+LINE_ITEMS = {
+    "revenue": "Revenue",
+    "cost_of_revenue": "Cost of Revenue",
+    "gross_profit": "Gross Profit",
+    "operating_income": "Operating Income",
+    "net_income": "Net Income",
+    "eps_diluted": "EPS (Diluted)",
+    "total_assets": "Total Assets",
+    "total_liabilities": "Total Liabilities",
+    "total_equity": "Total Equity",
+    "operating_cash_flow": "Operating Cash Flow",
+}
+
+# Ratios and growth rates computed locally, in table order
+DERIVED = {
+    "gross_margin": "Gross Margin %",
+    "operating_margin": "Operating Margin %",
+    "net_margin": "Net Margin %",
+    "roa": "ROA %",
+    "roe": "ROE %",
+    "debt_to_equity": "Debt to Equity",
+    "revenue_growth": "Revenue Growth %",
+    "net_income_growth": "Net Income Growth %",
+}
+
+PERIOD_SCHEMA = {
+    "type": "object",
+    "properties": dict(
+        {
+            "company": {"type": "string"},
+            "period": {"type": "string"},
+            "currency": {"type": "string"},
+            "unit": {"type": "string"},
+        },
+        **{k: {"type": ["number", "null"]} for k in LINE_ITEMS}
+    ),
+    "required": ["company", "period", "currency", "unit"] + list(LINE_ITEMS),
+}
+
+def period_key(label: str) -> tuple:
+    """Sort key for labels like 'Q2 FY24', 'FY2023', 'H1 2022'."""
+    text = str(label).upper()
+    year = 0
+    m = re.search(r"(?:19|20)\d{2}", text)
+    if m:
+        year = int(m.group())
+    else:
+        m = re.search(r"(?:FY|')\s?(\d{2})\b", text)
+        if m:
+            year = 2000 + int(m.group(1))
+    sub = 9  # full year sorts after its quarters/halves
+    m = re.search(r"\bQ([1-4])\b", text) or re.search(r"\b([1-4])Q\b", text)
+    if m:
+        sub = int(m.group(1)) * 2
+    else:
+        m = re.search(r"\bH([12])\b", text)
+        if m:
+            sub = int(m.group(1)) * 4
+    return (year, sub, text)
+
+def _to_number(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().replace(",", "")
+    negative = text.startswith("(") and text.endswith(")")
+    text = text.strip("()$€£¥% ")
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return -number if negative else number
+
+def parse_line_items(text: str) -> list[dict]:
+    """
+    Parse the model's JSON reply (a period object or a list of them, possibly
+    inside a code fence) into period dicts with numeric line items.
+    """
+    m = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    payload = m.group(1) if m else text
+    start = min((i for i in (payload.find("{"), payload.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise ValueError("No JSON object in the model response")
+    data, _ = json.JSONDecoder().raw_decode(payload[start:])
+    if isinstance(data, dict):
+        data = data.get("periods", [data])
+    periods = []
+    for item in data:
+        period = {k: item.get(k) or "" for k in ("company", "period", "currency", "unit")}
+        period.update({k: _to_number(item.get(k)) for k in LINE_ITEMS})
+        periods.append(period)
+    return periods
+
+def build_frame(periods: list[dict]) -> pd.DataFrame:
+    """
+    One row per company and period (chronological within each company), one
+    column per line item and derived metric. Rows are labelled by period, or
+    by "company period" when more than one company is present.
+    """
+    df = pd.DataFrame(periods)
+    for col in ("company", "period") + tuple(LINE_ITEMS):
+        if col not in df:
+            df[col] = None
+    df[list(LINE_ITEMS)] = df[list(LINE_ITEMS)].apply(pd.to_numeric, errors="coerce")
+    df["company"] = df["company"].fillna("").astype(str).str.strip()
+    df = df.drop_duplicates(["company", "period"], keep="last")
+    order = sorted(range(len(df)), key=lambda i: (df["company"].iloc[i].upper(), period_key(df["period"].iloc[i])))
+    df = compute_derived(df.iloc[order])
+    if df["company"].nunique() > 1:
+        labels = (df["company"] + " " + df["period"].astype(str)).str.strip()
+    else:
+        labels = df["period"]
+    return df.set_index(labels.rename("period"))
+
+def compute_derived(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add derived ratios and period-over-period growth in one vectorized pass;
+    growth is computed within each company, never across companies.
+    """
+    revenue = df["revenue"].where(df["revenue"] != 0)
+    equity = df["total_equity"].where(df["total_equity"] != 0)
+    assets = df["total_assets"].where(df["total_assets"] != 0)
+    gross = df["gross_profit"].fillna(df["revenue"] - df["cost_of_revenue"])
+    by_company = df.groupby("company", sort=False) if "company" in df else None
+    def growth(col):
+        if by_company is None:
+            return df[col].pct_change(fill_method=None) * 100
+        return by_company[col].pct_change(fill_method=None) * 100
+    return df.assign(
+        gross_profit=gross,
+        gross_margin=gross / revenue * 100,
+        operating_margin=df["operating_income"] / revenue * 100,
+        net_margin=df["net_income"] / revenue * 100,
+        roa=df["net_income"] / assets * 100,
+        roe=df["net_income"] / equity * 100,
+        debt_to_equity=df["total_liabilities"] / equity,
+        revenue_growth=growth("revenue"),
+        net_income_growth=growth("net_income"),
+    )
+
+def _fmt(value, derived: bool) -> str:
+    if pd.isna(value):
+        return "NA"
+    if derived:
+        return f"{value:,.2f}"
+    return f"{value:,.0f}" if abs(value) >= 100 else f"{value:,.2f}"
+
+def render_table(df: pd.DataFrame, first_width: int = 30, width: int = 15) -> str:
+    """
+    Render metrics as rows and periods as columns in the same fenced,
+    '|'-separated layout the prompts ask the model for; columns widen to
+    fit company-qualified period labels.
+    """
+    periods = [str(p) for p in df.index]
+    width = max([width] + [len(p) for p in periods])
+    header = ["Metric".ljust(first_width)] + [p[:width].ljust(width) for p in periods]
+    rule = ["-" * first_width] + ["-" * width] * len(periods)
+    rows = []
+    for metrics, derived in ((LINE_ITEMS, False), (DERIVED, True)):
+        for col, label in metrics.items():
+            cells = [_fmt(v, derived).rjust(width) for v in df[col]]
+            rows.append([label.ljust(first_width)] + cells)
+    lines = ["| " + " | ".join(r) + " |" for r in [header, rule] + rows]
+    unit = ", ".join(sorted({f"{c} {u}".strip() for c, u in zip(df["currency"], df["unit"]) if c or u}))
+    caption = f"Amounts in {unit}" if unit else ""
+    return "```\n" + "\n".join(lines) + "\n```" + (f"\n{caption}" if caption else "")
@@ -0,0 +1,142 @@
+import os
+import time
+import sqlite3
+import threading
+
+from .config import config
+from .metrics import LINE_ITEMS, period_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    company      TEXT NOT NULL,
+    period       TEXT NOT NULL,
+    metric       TEXT NOT NULL,
+    value        REAL,
+    currency     TEXT,
+    unit         TEXT,
+    source_sha   TEXT NOT NULL,
+    extracted_at REAL NOT NULL,
+    PRIMARY KEY (company, period, metric)
+);
+CREATE INDEX IF NOT EXISTS metrics_series ON metrics (company, metric, period);
+CREATE INDEX IF NOT EXISTS metrics_source ON metrics (source_sha);
+CREATE TABLE IF NOT EXISTS period_sources (
+    source_sha   TEXT NOT NULL,
+    company      TEXT NOT NULL,
+    period       TEXT NOT NULL,
+    extracted_at REAL NOT NULL,
+    PRIMARY KEY (source_sha, company, period)
+);
+CREATE INDEX IF NOT EXISTS period_sources_period ON period_sources (company, period);
+"""
+
+# One-time migrations, applied in order and tracked in PRAGMA user_version
+MIGRATIONS = [
+    # Stores created before period_sources: each period belongs to the file it was last stored from
+    "INSERT OR IGNORE INTO period_sources "
+    "SELECT source_sha, company, period, MAX(extracted_at) FROM metrics GROUP BY source_sha, company, period",
+]
+
+class MetricsStore:
+    """
+    SQLite store of extracted line items: one row per company/period/metric,
+    with the hash of the file it was last stored from and when. A period
+    reported by several filings (e.g. prior-year columns) is stored once and
+    listed in period_sources under every file that reports it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        for i, statement in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self._conn:
+                self._conn.execute(statement)
+                self._conn.execute(f"PRAGMA user_version = {i}")
+
+    def upsert_periods(self, periods: list[dict], source_sha: str):
+        """Store the line items of periods extracted from the file with source_sha."""
+        now = time.time()
+        keys = [(p["company"].strip(), p["period"].strip()) for p in periods]
+        rows = [
+            (company, period, metric, p.get(metric), p.get("currency"), p.get("unit"), source_sha, now)
+            for (company, period), p in zip(keys, periods)
+            for metric in LINE_ITEMS
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO period_sources VALUES (?, ?, ?, ?)",
+                [(source_sha, company, period, now) for company, period in keys]
+            )
+
+    def _periods(self, where: str, args: tuple) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.company, m.period, m.metric, m.value, m.currency, m.unit "
+                "FROM metrics m JOIN period_sources s ON s.company = m.company AND s.period = m.period "
+                f"WHERE {where}", args
+            ).fetchall()
+        periods = {}
+        for company, period, metric, value, currency, unit in rows:
+            entry = periods.setdefault((company, period), {
+                "company": company, "period": period, "currency": currency or "", "unit": unit or "",
+            })
+            entry[metric] = value
+        return sorted(periods.values(), key=lambda p: period_key(p["period"]))
+
+    def periods_for_source(self, source_sha: str) -> list[dict]:
+        """Rebuild the period dicts previously extracted from a file, or [] if unknown."""
+        return self._periods("s.source_sha = ?", (source_sha,))
+
+    def time_series(self, company: str, metric: str) -> list[tuple[str, float]]:
+        """(period, value) pairs for one company and metric, in chronological order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT period, value FROM metrics WHERE company = ? AND metric = ?",
+                (company, metric)
+            ).fetchall()
+        return sorted(rows, key=lambda r: period_key(r[0]))
+
+    def companies(self) -> list[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT company FROM metrics ORDER BY company")]
+
+    def known_periods(self, text: str) -> list[tuple[str, str]]:
+        """(company, period) pairs on record for the stored companies named in text."""
+        text = text.lower()
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT company, period FROM period_sources").fetchall()
+        return sorted(
+            ((c, p) for c, p in rows if c.lower() in text),
+            key=lambda r: (r[0], period_key(r[1]))
+        )
+
+    def fill_known(self, periods: list[dict]) -> list[dict]:
+        """
+        Replace periods the model left empty because they are on record
+        (every line item null) with their stored line items.
+        """
+        filled = []
+        for p in periods:
+            if all(p.get(m) is None for m in LINE_ITEMS):
+                key = (p["company"].strip(), p["period"].strip())
+                stored = self._periods("s.company = ? AND s.period = ?", key)
+                if stored:
+                    p = stored[0]
+            filled.append(p)
+        return filled
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+metrics_store = MetricsStore(os.path.join(config.cache_dir, "metrics.sqlite3"))
@@ -0,0 +1,128 @@
+import os
+import re
+import json
+import hashlib
+from pypdf import PdfReader, PdfWriter
+
+from .config import config
+from .pdf_text import extract_texts, EXTRACTOR_VERSION
+
+# Bump when scoring changes so cached bundles are rebuilt
+FILTER_VERSION = "1"
+
+KEYWORDS = {
+    "income statement": 3.0,
+    "statement of operations": 3.0,
+    "statements of operations": 3.0,
+    "statement of income": 3.0,
+    "statements of income": 3.0,
+    "profit or loss": 3.0,
+    "comprehensive income": 2.0,
+    "balance sheet": 3.0,
+    "financial position": 3.0,
+    "cash flows": 3.0,
+    "cash flow": 2.0,
+    "earnings per share": 2.0,
+    "key figures": 1.5,
+    "highlights": 1.0,
+    "revenue": 1.0,
+    "net sales": 1.0,
+    "gross profit": 1.5,
+    "operating income": 1.5,
+    "operating profit": 1.5,
+    "net income": 1.5,
+    "net profit": 1.5,
+    "total assets": 1.5,
+    "total liabilities": 1.5,
+    "shareholders' equity": 1.0,
+    "ebitda": 1.0,
+}
+NUMBER_RE = re.compile(r"^\(?-?[$€£¥]?\d[\d,.]*%?\)?$")
+TABLE_ROW_RE = re.compile(r"\S+(?:\s{2,}|\t)\(?-?[$€£¥]?\d[\d,.]*\)?")
+
+def score_page(text: str) -> float:
+    """
+    Score how likely a page is to hold financial statements or KPIs:
+    weighted keyword hits + numeric density + rows that look like table lines.
+    """
+    lower = text.lower()
+    keyword_score = sum(w * min(lower.count(k), 3) for k, w in KEYWORDS.items())
+    tokens = text.split()
+    numbers = sum(1 for t in tokens if NUMBER_RE.match(t))
+    density = numbers / len(tokens) if tokens else 0.0
+    table_rows = sum(1 for ln in text.splitlines() if len(TABLE_ROW_RE.findall(ln)) >= 2)
+    return keyword_score + 10.0 * density + 0.5 * min(table_rows, 20)
+
+def select_pages(scores: list[float], threshold: float = None, max_pages: int = None) -> list[int]:
+    """
+    Keep 0-based page indexes scoring at least threshold * best score,
+    best first, capped at max_pages; returned in document order.
+    A lower threshold keeps more pages (higher recall).
+    """
+    threshold = config.prefilter_threshold if threshold is None else threshold
+    max_pages = max_pages or config.prefilter_max_pages
+    if not scores or max(scores) <= 0:
+        return []
+    cutoff = threshold * max(scores)
+    ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    return sorted(i for i in ranked[:max_pages] if scores[i] > 0 and scores[i] >= cutoff)
+
+def _bundle_path(pdf_path: str, sha: str) -> str:
+    params = f"{FILTER_VERSION}-{EXTRACTOR_VERSION}-{config.prefilter_threshold}-{config.prefilter_max_pages}"
+    key = hashlib.sha256(params.encode()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(config.cache_dir, "prefilter", f"{sha[:16]}-{key}", f"{stem}.financial-pages.pdf")
+
+def prefilter_pdf(pdf_path: str, text_result: dict = None) -> dict:
+    """
+    Write a compact PDF with only the financially relevant pages of pdf_path.
+    Returns {"path", "kept", "scores", "total"}; "path" is the original file
+    when nothing scores (e.g. scanned PDFs without a text layer).
+    """
+    if text_result is None:
+        text_result = extract_texts([pdf_path])[pdf_path]
+    if "error" in text_result:
+        return {"path": pdf_path, "kept": [], "scores": [], "total": 0}
+    pages = text_result["pages"]
+    out = _bundle_path(pdf_path, text_result["sha256"])
+    meta_path = out + ".json"
+    if os.path.exists(out) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return dict(json.load(f), path=out)
+
+    scores = [score_page(t) for t in pages]
+    kept = select_pages(scores)
+    if not kept or len(kept) == len(pages):
+        return {"path": pdf_path, "kept": list(range(len(pages))), "scores": scores, "total": len(pages)}
+
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for i in kept:
+        writer.add_page(reader.pages[i])
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = out + ".tmp"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, out)
+    meta = {"kept": kept, "scores": scores, "total": len(pages)}
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return dict(meta, path=out)
+
+def prefilter_pdfs(pdf_paths: list[str]) -> tuple[list[str], str]:
+    """
+    Pre-filter every PDF; return the paths to upload (in input order) and a
+    report of which pages were kept.
+    """
+    texts = extract_texts(pdf_paths)
+    paths, lines = [], []
+    for pdf_path in pdf_paths:
+        result = prefilter_pdf(pdf_path, texts[pdf_path])
+        paths.append(result["path"])
+        name = os.path.basename(pdf_path)
+        if result["path"] == pdf_path:
+            lines.append(f"{name}: sent unfiltered ({result['total']} pages)")
+        else:
+            kept = ", ".join(str(i + 1) for i in result["kept"])
+            lines.append(f"{name}: kept {len(result['kept'])}/{result['total']} pages ({kept})")
+    return paths, "\n".join(lines)
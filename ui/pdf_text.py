@@ -0,0 +1,120 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pypdf
+from pypdf import PdfReader
+
+from .config import config
+from .upload_cache import file_sha256
+
+# Bump the suffix whenever extraction output changes so old cache entries are ignored
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}-1"
+
+def _extract_pages(path: str) -> tuple[list[str], float]:
+    """Worker: return per-page text and the seconds spent parsing."""
+    start = time.perf_counter()
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception:
+            pages.append("")
+    return pages, time.perf_counter() - start
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted page text keyed by file hash and extractor version.
+    """
+    def __init__(self, directory: str, version: str = EXTRACTOR_VERSION):
+        self.directory = directory
+        self.version = version
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.directory, f"{sha}-{self.version}.json")
+
+    def get(self, sha: str):
+        try:
+            with open(self._path(sha), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def put(self, sha: str, pages: list[str], seconds: float):
+        entry = {"sha256": sha, "version": self.version, "pages": pages, "seconds": seconds}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self._path(sha) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, self._path(sha))
+        except Exception:
+            pass
+        return entry
+
+extraction_cache = ExtractionCache(os.path.join(config.cache_dir, "text"))
+
+def _result(path: str, sha: str, entry: dict, cached: bool) -> dict:
+    pages, seconds = entry["pages"], entry["seconds"]
+    return {
+        "path": path,
+        "sha256": sha,
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_sec": len(pages) / seconds if seconds else float("inf"),
+        "cached": cached,
+    }
+
+def extract_texts(pdf_paths: list[str], workers: int = None, on_progress=None) -> dict:
+    """
+    Extract per-page text for each PDF, parsing uncached files in parallel
+    across processes. Returns {path: result}, where result holds "pages",
+    "seconds", "pages_per_sec" (of the original parse) and "cached".
+    on_progress(path, result) is called as each file becomes available.
+    Failed files are returned with an "error" key instead of "pages".
+    """
+    results, todo = {}, {}
+    for path in pdf_paths:
+        sha = file_sha256(path)
+        entry = extraction_cache.get(sha)
+        if entry:
+            results[path] = _result(path, sha, entry, cached=True)
+            if on_progress:
+                on_progress(path, results[path])
+        else:
+            todo[path] = sha
+
+    if todo:
+        workers = workers or config.extract_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(_extract_pages, p): p for p in todo}
+            for fut in as_completed(futures):
+                path = futures[fut]
+                try:
+                    pages, seconds = fut.result()
+                except Exception as e:
+                    results[path] = {"path": path, "sha256": todo[path], "error": str(e)}
+                else:
+                    entry = extraction_cache.put(todo[path], pages, seconds)
+                    results[path] = _result(path, todo[path], entry, cached=False)
+                if on_progress:
+                    on_progress(path, results[path])
+    return results
+
+def extraction_report(results: dict, slow_pages_per_sec: float = None) -> str:
+    """One line per file with page count and parse speed; slow files are flagged."""
+    threshold = config.extract_slow_pages_per_sec if slow_pages_per_sec is None else slow_pages_per_sec
+    lines = []
+    for path, r in results.items():
+        name = os.path.basename(path)
+        if "error" in r:
+            lines.append(f"{name}: FAILED ({r['error']})")
+            continue
+        flag = "  <-- slow" if r["pages_per_sec"] < threshold else ""
+        source = "cache" if r["cached"] else "parsed"
+        lines.append(
+            f"{name}: {len(r['pages'])} pages, {r['seconds']:.2f}s, "
+            f"{r['pages_per_sec']:.1f} pages/s ({source}){flag}"
+        )
+    return "\n".join(lines)
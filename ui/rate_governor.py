@@ -0,0 +1,202 @@
+import re
+import time
+import random
+import threading
+import httpx
+
+from .config import config
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Safe to resend after a timeout or server error; a POST (runs, messages,
+# uploads) may already have been applied, so it is only resent when it
+# never reached the server or was rejected with 429
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+def _parse_duration(value: str) -> float:
+    """Seconds in a reset header such as '1s', '6m0s' or '250ms'."""
+    if not value:
+        return 0.0
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+def _retry_after(response) -> float:
+    """Server-requested wait in seconds, or None."""
+    ms = response.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return None
+
+class TokenBucket:
+    """
+    Classic token bucket; unlimited until calibrated from response headers.
+    """
+    def __init__(self):
+        self.capacity = None
+        self.rate = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until amount tokens are available, then take them."""
+        while True:
+            with self._lock:
+                if self.capacity is None:
+                    return
+                now = time.monotonic()
+                self._refill(now)
+                amount = min(amount, self.capacity)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            wait = min(wait, 5.0)
+            self.waited += wait
+            time.sleep(wait)
+
+    def calibrate(self, limit: int, remaining: int, reset: float):
+        """
+        Adopt the server's view: capacity is the limit, and the bucket refills
+        the used part over the reset window (or a minute, for per-minute limits).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.capacity = float(max(limit, 1))
+            used = self.capacity - remaining
+            self.rate = max(used / reset if reset > 0 and used > 0 else self.capacity / 60.0, 0.01)
+            self.tokens = float(min(remaining, self.capacity))
+
+    def utilisation(self):
+        with self._lock:
+            if self.capacity is None:
+                return None
+            self._refill(time.monotonic())
+            return 1.0 - self.tokens / self.capacity
+
+class RateGovernor:
+    """
+    Paces every API request through request and token buckets calibrated from
+    the x-ratelimit-* response headers, and retries 429/5xx responses with
+    jittered exponential backoff that honours Retry-After.
+    """
+    def __init__(self):
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+        self.sent = 0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _estimate_tokens(self, request) -> int:
+        if request.method != "POST" or request.headers.get("content-type", "").startswith("multipart/"):
+            return 1
+        try:
+            return max(1, len(request.content) // 4)
+        except httpx.RequestNotRead:
+            return 1
+
+    def before(self, request):
+        self.requests.acquire(1)
+        self.tokens.acquire(self._estimate_tokens(request))
+        with self._lock:
+            self.sent += 1
+
+    def observe(self, response):
+        h = response.headers
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            try:
+                limit = int(h[f"x-ratelimit-limit-{kind}"])
+                remaining = int(h[f"x-ratelimit-remaining-{kind}"])
+            except (KeyError, ValueError):
+                continue
+            bucket.calibrate(limit, remaining, _parse_duration(h.get(f"x-ratelimit-reset-{kind}", "")))
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """Seconds to wait before retry number attempt (0-based)."""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 0.25)
+        base = min(config.governor_backoff_max, config.governor_backoff_base * 2 ** attempt)
+        return random.uniform(base / 2, base)
+
+    def record_retry(self, throttled: bool):
+        with self._lock:
+            self.retries += 1
+            if throttled:
+                self.throttled += 1
+
+    def utilisation(self) -> dict:
+        """Snapshot of bucket usage (0..1, None if not yet calibrated) and counters."""
+        with self._lock:
+            sent, retries, throttled = self.sent, self.retries, self.throttled
+        return {
+            "requests": self.requests.utilisation(),
+            "tokens": self.tokens.utilisation(),
+            "waited": self.requests.waited + self.tokens.waited,
+            "sent": sent,
+            "retries": retries,
+            "throttled": throttled,
+        }
+
+    def describe(self) -> str:
+        u = self.utilisation()
+        fmt = lambda v: "n/a" if v is None else f"{v:.0%}"
+        return (
+            f"API req {fmt(u['requests'])} · tok {fmt(u['tokens'])} · "
+            f"{u['sent']} calls · {u['retries']} retries ({u['throttled']} throttled)"
+        )
+
+class GovernedTransport(httpx.BaseTransport):
+    """
+    httpx transport that sends every request through the governor and
+    retries it with the governor's backoff (idempotent methods on any
+    transient error, others only on connect errors and 429).
+    """
+    def __init__(self, inner: httpx.BaseTransport, governor: RateGovernor):
+        self.inner = inner
+        self.governor = governor
+
+    def handle_request(self, request):
+        attempts = config.http_max_retries
+        if request.method in IDEMPOTENT_METHODS:
+            errors, statuses = (httpx.ConnectError, httpx.ReadTimeout, httpx.RemoteProtocolError), RETRY_STATUSES
+        else:
+            errors, statuses = (httpx.ConnectError,), {429}
+        for attempt in range(attempts + 1):
+            self.governor.before(request)
+            try:
+                response = self.inner.handle_request(request)
+            except errors:
+                if attempt == attempts:
+                    raise
+                self.governor.record_retry(False)
+                time.sleep(self.governor.backoff(attempt))
+                continue
+            self.governor.observe(response)
+            if response.status_code not in statuses or attempt == attempts:
+                return response
+            wait = self.governor.backoff(attempt, _retry_after(response))
+            response.close()
+            self.governor.record_retry(response.status_code == 429)
+            time.sleep(wait)
+
+    def close(self):
+        self.inner.close()
+
+governor = RateGovernor()
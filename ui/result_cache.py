@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from .config import config
+from .upload_cache import file_sha256
+
+def prompt_version() -> str:
+    """Hash of every prompt template in analyzer; changes invalidate cached results."""
+    from . import analyzer
+    h = hashlib.sha256()
+    for name in sorted(dir(analyzer)):
+        value = getattr(analyzer, name)
+        if name.isupper() and isinstance(value, str):
+            h.update(name.encode())
+            h.update(value.encode())
+    return h.hexdigest()[:12]
+
+class ResultCache:
+    """
+    Size-bounded on-disk LRU of analysis results keyed by the selected files'
+    content hashes (order-insensitive), prompt version and assistant ID.
+    """
+    def __init__(self, directory: str, max_bytes: int = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key(self, pdf_paths: list[str], assistant_id: str, mode: str = None) -> str:
+        hashes = sorted(file_sha256(p) for p in pdf_paths)
+        from .analyzer import route_signature
+        parts = [assistant_id, mode or config.analysis_mode, str(config.use_page_filter), route_signature()] + hashes
+        digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+        return f"{prompt_version()}-{digest[:32]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, pdf_paths: list[str], assistant_id: str, mode: str = None):
+        """Return the cached entry ({"text", "thread_id", "created_at"}) or None."""
+        path = self._path(self.key(pdf_paths, assistant_id, mode))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+            return entry
+        except Exception:
+            return None
+
+    def put(self, pdf_paths: list[str], assistant_id: str, text: str, thread_id: str = None, mode: str = None):
+        key = self.key(pdf_paths, assistant_id, mode)
+        entry = {
+            "text": text,
+            "thread_id": thread_id,
+            "files": [os.path.basename(p) for p in pdf_paths],
+            "created_at": time.time(),
+        }
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp = self._path(key) + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp, self._path(key))
+            except Exception:
+                return
+            self._evict(keep_version=key.split("-", 1)[0])
+
+    def _evict(self, keep_version: str):
+        """Drop results from other prompt versions, then least recently used ones over the size limit."""
+        max_bytes = self.max_bytes or config.result_cache_max_mb * 1024 * 1024
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if not name.startswith(keep_version + "-"):
+                    os.remove(path)
+                    continue
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate(self, pdf_paths: list[str], assistant_id: str, mode: str = None):
+        try:
+            os.remove(self._path(self.key(pdf_paths, assistant_id, mode)))
+        except OSError:
+            pass
+
+result_cache = ResultCache(os.path.join(config.cache_dir, "results"))
+# Per-document map summaries, shared by every batch that includes the document
+map_cache = ResultCache(os.path.join(config.cache_dir, "map"))
@@ -0,0 +1,86 @@
+import os
+import time
+import hashlib
+import threading
+
+from .config import config
+from .upload_cache import file_sha256
+from .local_retrieval import DocumentIndex
+
+def document_set_fingerprint(pdf_paths) -> str:
+    """Order-insensitive fingerprint of the documents a chat is about."""
+    hashes = sorted(file_sha256(p) for p in pdf_paths or [])
+    return hashlib.sha256("\n".join(hashes).encode()).hexdigest()[:16]
+
+class SemanticCache:
+    """
+    Stores chat answers in a FAISS index per document set and embedder, and
+    returns a stored answer when a new question is similar enough.
+    Entries expire after a TTL and the least recently used are evicted
+    beyond max_entries per document set. Chats without documents are not
+    cached: they share no context that would make an answer reusable.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._spaces = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _space(self, fingerprint: str, embedder) -> DocumentIndex:
+        name = f"{fingerprint}-{hashlib.sha256(embedder.id.encode()).hexdigest()[:8]}"
+        with self._lock:
+            if name not in self._spaces:
+                self._spaces[name] = DocumentIndex(os.path.join(self.directory, name), embedder)
+            return self._spaces[name]
+
+    def _expired(self, entry: dict) -> bool:
+        return time.time() - entry["created_at"] > config.semantic_cache_ttl_hours * 3600
+
+    def lookup(self, fingerprint: str, question: str, embedder):
+        """
+        Return (entry, vector): the best stored entry ({"text", "answer",
+        "score", ...}) if it passes the similarity threshold, else None, and
+        the question's embedding for a later store().
+        """
+        space = self._space(fingerprint, embedder)
+        vector = embedder.embed([question])
+        for score, entry in space.search(vector, 3):
+            if self._expired(entry) or score < config.semantic_cache_threshold:
+                continue
+            entry["last_used"] = time.time()
+            # Persist the use so LRU eviction still sees it after a restart
+            space.save()
+            with self._lock:
+                self.hits += 1
+            return dict(entry, score=score), vector
+        with self._lock:
+            self.misses += 1
+        return None, vector
+
+    def store(self, fingerprint: str, question: str, answer: str, embedder, vector=None):
+        space = self._space(fingerprint, embedder)
+        now = time.time()
+        space.add([{"text": question, "answer": answer, "created_at": now, "last_used": now}], vector)
+        self._evict(space)
+        space.save()
+
+    def _evict(self, space: DocumentIndex):
+        stale = {i for i, e in space.chunks.items() if self._expired(e)}
+        live = sorted(
+            (i for i in space.chunks if i not in stale),
+            key=lambda i: space.chunks[i]["last_used"]
+        )
+        overflow = max(0, len(live) - config.semantic_cache_max_entries)
+        space.remove(list(stale) + live[:overflow])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+semantic_cache = SemanticCache(os.path.join(config.cache_dir, "semantic"))
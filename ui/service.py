@@ -0,0 +1,267 @@
+import os
+import re
+import json
+import time
+import base64
+import hmac
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from .config import config
+from .jobs import scheduler, PRIORITY_CHAT, PRIORITY_ANALYSIS
+from .rate_governor import governor
+
+class AnalyzerBackend:
+    """Runs requests through the analyzer with the process-wide caches."""
+    def analyze(self, files: list[str], force: bool = False, on_delta=None) -> dict:
+        from .batch import cached_analysis
+        result = cached_analysis("comparative", files, config.api_key, config.assistant_id, force,
+                                 on_delta=on_delta)
+        return {"text": result["text"], "thread_id": result["thread_id"], "cached": result["cached"]}
+
+    def chat(self, message: str, thread_id: str = None, files: list[str] = (), on_delta=None,
+             ask_anyway: bool = False) -> dict:
+        from .analyzer import chat_with_openai
+        from .semantic_cache import semantic_cache, document_set_fingerprint
+        from .local_retrieval import OpenAIEmbedder
+        fingerprint = vector = embedder = None
+        if config.use_semantic_cache and files:
+            embedder = OpenAIEmbedder(config.api_key)
+            fingerprint = document_set_fingerprint(list(files))
+            if not ask_anyway:
+                hit, vector = semantic_cache.lookup(fingerprint, message, embedder)
+                if hit:
+                    return {"text": hit["answer"], "thread_id": thread_id, "cached": True, "score": hit["score"]}
+        text, tid = chat_with_openai(
+            config.api_key, config.assistant_id, message, thread_id=thread_id, on_delta=on_delta,
+            pdf_paths=list(files)
+        )
+        if fingerprint is not None:
+            semantic_cache.store(fingerprint, message, text, embedder, vector)
+        return {"text": text, "thread_id": tid, "cached": False}
+
+class StubBackend:
+    """Offline backend with canned replies, for exercising the service without an API key."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = []
+
+    def _reply(self, text: str, on_delta):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.latency / max(len(words), 1))
+            if on_delta:
+                on_delta(word if i == 0 else " " + word)
+        return text
+
+    def analyze(self, files: list[str], force: bool = False, on_delta=None) -> dict:
+        self.calls.append(("analyze", list(files)))
+        names = ", ".join(os.path.basename(f) for f in files)
+        text = self._reply(f"Stub analysis of {len(files)} file(s): {names}", on_delta)
+        return {"text": text, "thread_id": "thread_stub", "cached": False}
+
+    def chat(self, message: str, thread_id: str = None, files: list[str] = (), on_delta=None,
+             ask_anyway: bool = False) -> dict:
+        self.calls.append(("chat", message))
+        text = self._reply(f"Stub reply to: {message}", on_delta)
+        return {"text": text, "thread_id": thread_id or "thread_stub", "cached": False}
+
+class AnalysisService:
+    """
+    Shared analysis state behind the HTTP handler: uploaded PDFs stored by
+    content hash, and jobs on the process-wide scheduler with their output.
+    Output is kept as long as the scheduler keeps the job (see
+    MAX_FINISHED_JOBS).
+    """
+    def __init__(self, backend=None, upload_dir: str = None):
+        self.backend = backend or AnalyzerBackend()
+        self.upload_dir = upload_dir or os.path.join(config.cache_dir, "service_uploads")
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.records = {}
+
+    # Uploads
+    def _upload_path(self, sha: str, name: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{64}", sha or ""):
+            raise ValueError(f"Invalid sha256: {sha!r}")
+        return os.path.join(self.upload_dir, sha, os.path.basename(name) or "document.pdf")
+
+    def missing(self, shas: list[str]) -> list[str]:
+        def present(sha):
+            folder = os.path.dirname(self._upload_path(sha, ""))
+            return os.path.isdir(folder) and bool(os.listdir(folder))
+        return [s for s in shas if not present(s)]
+
+    def store_upload(self, name: str, content: bytes) -> str:
+        sha = hashlib.sha256(content).hexdigest()
+        path = self._upload_path(sha, name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return sha
+
+    def resolve(self, files: list[dict]) -> list[str]:
+        """Map [{"sha256", "name"}] to stored paths; raises KeyError listing missing hashes."""
+        missing = self.missing([f["sha256"] for f in files])
+        if missing:
+            raise KeyError(missing)
+        paths = []
+        for f in files:
+            wanted = self._upload_path(f["sha256"], f.get("name", ""))
+            folder = os.path.dirname(wanted)
+            paths.append(wanted if os.path.exists(wanted) else os.path.join(folder, sorted(os.listdir(folder))[0]))
+        return paths
+
+    # Jobs
+    def _submit(self, kind: str, name: str, priority: int, run) -> int:
+        record = {"kind": kind, "output": []}
+        job = scheduler.submit(lambda: run(record["output"].append), name=name, priority=priority)
+        with self._lock:
+            self.records[job.id] = record
+            # Drop the output of jobs the scheduler has forgotten
+            for job_id in [i for i in self.records if i not in scheduler.jobs]:
+                del self.records[job_id]
+        return job.id
+
+    def submit_analysis(self, files: list[dict], force: bool = False) -> int:
+        paths = self.resolve(files)
+        return self._submit("analyze", f"Analyze {len(paths)} PDF(s)", PRIORITY_ANALYSIS,
+                            lambda on_delta: self.backend.analyze(paths, force=force, on_delta=on_delta))
+
+    def submit_chat(self, message: str, thread_id: str = None, files: list[dict] = (), ask_anyway: bool = False) -> int:
+        paths = self.resolve(list(files)) if files else []
+        return self._submit("chat", f"Chat: {message[:60]}", PRIORITY_CHAT,
+                            lambda on_delta: self.backend.chat(message, thread_id, paths, on_delta, ask_anyway))
+
+    def job_status(self, job_id: int, offset: int = 0) -> dict:
+        job = scheduler.jobs.get(job_id)
+        record = self.records.get(job_id)
+        if job is None or record is None:
+            raise KeyError(job_id)
+        output = "".join(record["output"])
+        status = {
+            "id": job.id,
+            "kind": record["kind"],
+            "name": job.name,
+            "state": job.state,
+            "elapsed": round(job.elapsed, 2),
+            "text": output[offset:],
+            "offset": len(output),
+        }
+        if job.state == "done":
+            status["result"] = job.result
+        elif job.state == "failed":
+            status["error"] = str(job.error)
+        return status
+
+    def wait(self, job_id: int, offset: int, timeout: float) -> dict:
+        """Long-poll: return once there is new output, the job ends, or timeout passes."""
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.job_status(job_id, offset)
+            if status["text"] or status["state"] in ("done", "failed", "cancelled"):
+                return status
+            if time.monotonic() >= deadline:
+                return status
+            time.sleep(0.1)
+
+    def status(self) -> dict:
+        jobs = [j for j in scheduler.jobs.values() if j.id in self.records]
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "workers": scheduler.workers,
+            "active_jobs": sum(1 for j in jobs if j.state in ("queued", "running")),
+            "total_jobs": len(jobs),
+            "backend": type(self.backend).__name__,
+            "governor": governor.utilisation(),
+        }
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints: /status, /uploads, /uploads/check, /analyze, /chat, /jobs/<id>[/cancel]."""
+    service = None  # set by make_server
+    token = ""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > config.service_max_upload_mb * 1024 * 1024:
+            raise ValueError("Request body too large")
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _authorized(self) -> bool:
+        if not self.token:
+            return True
+        supplied = self.headers.get("Authorization", "").encode()
+        if hmac.compare_digest(supplied, f"Bearer {self.token}".encode()):
+            return True
+        self._send(401, {"error": "unauthorized"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/status":
+            return self._send(200, self.service.status())
+        m = re.fullmatch(r"/jobs/(\d+)", url.path)
+        if m:
+            offset = int(query.get("offset", ["0"])[0])
+            wait = min(float(query.get("wait", ["0"])[0]), 30.0)
+            try:
+                return self._send(200, self.service.wait(int(m.group(1)), offset, wait))
+            except KeyError:
+                return self._send(404, {"error": "unknown job"})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path
+        try:
+            body = self._body()
+            if path == "/uploads/check":
+                return self._send(200, {"missing": self.service.missing(body.get("sha256", []))})
+            if path == "/uploads":
+                content = base64.b64decode(body["content_b64"])
+                return self._send(200, {"sha256": self.service.store_upload(body.get("name", ""), content)})
+            if path == "/analyze":
+                job_id = self.service.submit_analysis(body["files"], force=bool(body.get("force")))
+                return self._send(202, {"job_id": job_id})
+            if path == "/chat":
+                job_id = self.service.submit_chat(
+                    body["message"], body.get("thread_id"), body.get("files", []), bool(body.get("ask_anyway"))
+                )
+                return self._send(202, {"job_id": job_id})
+            m = re.fullmatch(r"/jobs/(\d+)/cancel", path)
+            if m:
+                scheduler.cancel(int(m.group(1)))
+                return self._send(200, {"cancelled": int(m.group(1))})
+        except KeyError as e:
+            return self._send(409 if isinstance(e.args[0], list) else 400, {"error": "missing", "detail": e.args[0]})
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(404, {"error": "not found"})
+
+def make_server(service: AnalysisService, host: str = None, port: int = None, token: str = None):
+    """Build (but do not start) a threaded HTTP server for service."""
+    handler = type("BoundServiceHandler", (ServiceHandler,), {
+        "service": service,
+        "token": config.service_token if token is None else token,
+    })
+    return ThreadingHTTPServer((host or config.service_host, config.service_port if port is None else port), handler)
@@ -0,0 +1,75 @@
+import os
+import base64
+import requests
+
+from .config import config
+from .upload_cache import file_sha256
+from .jobs import JobCancelled, check_cancelled
+
+class ServiceClient:
+    """
+    Thin client for a shared analysis service (see ui/service.py). PDFs are
+    sent only if the service does not already hold the same content.
+    """
+    def __init__(self, base_url: str = None, token: str = None):
+        self.base_url = (base_url or config.service_url).rstrip("/")
+        self.token = config.service_token if token is None else token
+        self.session = requests.Session()
+        if self.token:
+            self.session.headers["Authorization"] = f"Bearer {self.token}"
+
+    def _call(self, method: str, path: str, **kwargs) -> dict:
+        resp = self.session.request(method, self.base_url + path, timeout=config.http_timeout, **kwargs)
+        if resp.status_code >= 400:
+            try:
+                detail = resp.json().get("error", resp.text)
+            except ValueError:
+                detail = resp.text
+            raise RuntimeError(f"Service error {resp.status_code}: {detail}")
+        return resp.json()
+
+    def status(self) -> dict:
+        return self._call("GET", "/status")
+
+    def _ensure_uploaded(self, pdf_paths: list[str]) -> list[dict]:
+        files = [{"name": os.path.basename(p), "sha256": file_sha256(p)} for p in pdf_paths]
+        missing = set(self._call("POST", "/uploads/check", json={"sha256": [f["sha256"] for f in files]})["missing"])
+        for path, f in zip(pdf_paths, files):
+            if f["sha256"] in missing:
+                with open(path, "rb") as fh:
+                    content = base64.b64encode(fh.read()).decode()
+                self._call("POST", "/uploads", json={"name": f["name"], "content_b64": content})
+        return files
+
+    def wait(self, job_id: int, on_delta=None) -> dict:
+        """Follow a job's output until it ends; cancels it remotely if the local job is cancelled."""
+        offset = 0
+        while True:
+            try:
+                check_cancelled()
+            except JobCancelled:
+                self._call("POST", f"/jobs/{job_id}/cancel")
+                raise
+            status = self._call("GET", f"/jobs/{job_id}", params={"offset": offset, "wait": 10})
+            if status["text"] and on_delta:
+                on_delta(status["text"])
+            offset = status["offset"]
+            if status["state"] == "done":
+                return status["result"]
+            if status["state"] == "failed":
+                raise RuntimeError(status.get("error", "Service job failed"))
+            if status["state"] == "cancelled":
+                raise JobCancelled(f"Service job {job_id} was cancelled")
+
+    def analyze(self, pdf_paths: list[str], force: bool = False, on_delta=None) -> dict:
+        files = self._ensure_uploaded(pdf_paths)
+        job_id = self._call("POST", "/analyze", json={"files": files, "force": force})["job_id"]
+        return self.wait(job_id, on_delta)
+
+    def chat(self, message: str, thread_id: str = None, pdf_paths: list[str] = (), on_delta=None,
+             ask_anyway: bool = False) -> dict:
+        files = self._ensure_uploaded(list(pdf_paths)) if pdf_paths else []
+        job_id = self._call("POST", "/chat", json={
+            "message": message, "thread_id": thread_id, "files": files, "ask_anyway": ask_anyway
+        })["job_id"]
+        return self.wait(job_id, on_delta)
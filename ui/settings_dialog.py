@@ -4,6 +4,7 @@ from tkinter import filedialog, messagebox, simpledialog
 import ttkbootstrap as ttk
 from tkinter.ttk import Combobox
 from .config import config
+from .client_manager import client_manager
 
 class SettingsDialog(tk.Toplevel):
     def __init__(self, parent, api_key: str, assistant_id: str):
@@ -38,6 +39,49 @@ class SettingsDialog(tk.Toplevel):
         aid_var = tk.StringVar(value=assistant_id or config.assistant_id)
         ttk.Entry(form, textvariable=aid_var, width=50).pack(fill=tk.X, pady=(0,15))
 
+        # Upload Cache
+        upload_cache_var = tk.BooleanVar(value=config.use_upload_cache)
+        ttk.Checkbutton(form, text="Reuse previously uploaded PDFs", variable=upload_cache_var)\
+           .pack(anchor="w", pady=(0,5))
+
+        # Streaming
+        streaming_var = tk.BooleanVar(value=config.use_streaming)
+        ttk.Checkbutton(form, text="Stream responses as they are generated", variable=streaming_var)\
+           .pack(anchor="w", pady=(0,5))
+
+        # Page Filter
+        page_filter_var = tk.BooleanVar(value=config.use_page_filter)
+        ttk.Checkbutton(form, text="Upload only financial-statement pages", variable=page_filter_var)\
+           .pack(anchor="w", pady=(0,5))
+
+        # Watch Download Directory
+        watch_var = tk.BooleanVar(value=config.watch_enabled)
+        ttk.Checkbutton(form, text="Analyze new PDFs in the download directory automatically", variable=watch_var)\
+           .pack(anchor="w", pady=(0,15))
+
+        # Analysis Mode
+        ttk.Label(form, text="Analysis Mode:").pack(anchor="w")
+        mode_cb = Combobox(form, values=["file_search", "local", "map_reduce", "structured"], state="readonly")
+        mode_cb.set(config.analysis_mode)
+        mode_cb.pack(fill=tk.X, pady=(0,15))
+
+        # Model Routing
+        routing_var = tk.BooleanVar(value=config.use_model_routing)
+        ttk.Checkbutton(form, text="Use the fast model for per-document extraction and short chats\n"
+                                   "(these then no longer run on the assistant's model)",
+                        variable=routing_var).pack(anchor="w", pady=(0,5))
+        ttk.Label(form, text="Fast Model:").pack(anchor="w")
+        fast_var = tk.StringVar(value=config.fast_model)
+        ttk.Entry(form, textvariable=fast_var, width=50).pack(fill=tk.X, pady=(0,5))
+        ttk.Label(form, text="Strong Model (blank = the assistant's model):").pack(anchor="w")
+        strong_var = tk.StringVar(value=config.strong_model)
+        ttk.Entry(form, textvariable=strong_var, width=50).pack(fill=tk.X, pady=(0,15))
+
+        # Shared Analysis Service
+        ttk.Label(form, text="Analysis Service URL (optional):").pack(anchor="w")
+        service_var = tk.StringVar(value=config.service_url)
+        ttk.Entry(form, textvariable=service_var, width=50).pack(fill=tk.X, pady=(0,15))
+
         # Saved API Keys
         ttk.Label(form, text="Saved API Keys:").pack(anchor="w")
         keynames = list(config.saved_api_keys.keys())
@@ -105,6 +149,15 @@ class SettingsDialog(tk.Toplevel):
         def on_confirm():
             config.default_download_dir = dir_var.get().strip()
             config.assistant_id = aid_var.get().strip()
+            config.use_upload_cache = upload_cache_var.get()
+            config.use_streaming = streaming_var.get()
+            config.use_page_filter = page_filter_var.get()
+            config.watch_enabled = watch_var.get()
+            config.analysis_mode = mode_cb.get()
+            config.use_model_routing = routing_var.get()
+            config.fast_model = fast_var.get().strip()
+            config.strong_model = strong_var.get().strip()
+            config.service_url = service_var.get().strip()
 
             final_key = key_var.get().strip()
             if remember_key.get() and final_key:
@@ -117,6 +170,8 @@ class SettingsDialog(tk.Toplevel):
                 enc = config.encrypt_api_key(final_key, pin)
                 config.saved_api_keys[name] = {"api_key_enc": enc, "pin_hash": pin_hash}
 
+            if final_key != config.api_key:
+                client_manager.retain(final_key)
             config.api_key = final_key
             config.save()
             self.result = (config.api_key, config.assistant_id)
@@ -0,0 +1,151 @@
+import os
+import json
+import threading
+import tiktoken
+
+from .config import config
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Encoding files unavailable (offline first run); ~4 characters per token
+            _encoding = False
+    if _encoding is False:
+        return len(text or "") // 4
+    return len(_encoding.encode(text or ""))
+
+def _message_text(msg) -> str:
+    parts = []
+    for block in msg.content or []:
+        text = getattr(block, "text", None)
+        if text is not None:
+            parts.append(text.value)
+    return "\n".join(parts)
+
+class ThreadMirror:
+    """
+    Local copy of one thread's messages, kept current with cursor-based
+    fetches of only the messages created since the last sync.
+    """
+    def __init__(self, path: str, thread_id: str):
+        self.path = path
+        self.thread_id = thread_id
+        self.messages = []
+        self.summary = ""
+        self.summarized_upto = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.messages = data.get("messages", [])
+                self.summary = data.get("summary", "")
+                self.summarized_upto = data.get("summarized_upto", 0)
+        except Exception:
+            self.messages, self.summary, self.summarized_upto = [], "", 0
+
+    def _save(self):
+        data = {
+            "thread_id": self.thread_id,
+            "messages": self.messages,
+            "summary": self.summary,
+            "summarized_upto": self.summarized_upto,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def sync(self, client) -> list[dict]:
+        """Fetch messages newer than the last mirrored one; return them."""
+        with self._lock:
+            new = []
+            after = self.messages[-1]["id"] if self.messages else None
+            while True:
+                kwargs = {"thread_id": self.thread_id, "order": "asc", "limit": 100}
+                if after:
+                    kwargs["after"] = after
+                page = client.beta.threads.messages.list(**kwargs)
+                for msg in page.data:
+                    text = _message_text(msg)
+                    new.append({
+                        "id": msg.id,
+                        "role": msg.role,
+                        "text": text,
+                        "tokens": count_tokens(text),
+                    })
+                if not page.data or not getattr(page, "has_more", False):
+                    break
+                after = page.data[-1].id
+            if new:
+                self.messages.extend(new)
+                self._save()
+            return new
+
+    def last_reply(self):
+        for msg in reversed(self.messages):
+            if msg["role"] == "assistant":
+                return msg["text"]
+        return None
+
+    def context_options(self, summarize=None) -> dict:
+        """
+        Run options that keep the context within config.chat_context_tokens:
+        only the newest messages that fit are sent, and (if summarize is
+        given) older turns are replaced by a running summary.
+        """
+        budget = config.chat_context_tokens
+        keep, total = 0, 0
+        for msg in reversed(self.messages):
+            if keep and total + msg["tokens"] > budget:
+                break
+            total += msg["tokens"]
+            keep += 1
+        if keep == len(self.messages):
+            return {}
+
+        options = {"truncation_strategy": {"type": "last_messages", "last_messages": keep}}
+        dropped = len(self.messages) - keep
+        if summarize is not None:
+            if dropped > self.summarized_upto:
+                turns = "\n\n".join(
+                    f"{m['role']}: {m['text']}" for m in self.messages[self.summarized_upto:dropped]
+                )
+                earlier = f"Earlier summary:\n{self.summary}\n\n" if self.summary else ""
+                self.summary = summarize(earlier + turns)
+                self.summarized_upto = dropped
+                self._save()
+            if self.summary:
+                options["additional_instructions"] = (
+                    "Summary of the earlier part of this conversation, "
+                    "which is no longer shown in full:\n" + self.summary
+                )
+        return options
+
+class ThreadHistory:
+    """Registry of thread mirrors stored under one directory."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mirrors = {}
+
+    def get(self, thread_id: str) -> ThreadMirror:
+        with self._lock:
+            if thread_id not in self._mirrors:
+                path = os.path.join(self.directory, f"{thread_id}.json")
+                self._mirrors[thread_id] = ThreadMirror(path, thread_id)
+            return self._mirrors[thread_id]
+
+thread_history = ThreadHistory(os.path.join(config.cache_dir, "threads"))
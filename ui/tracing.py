@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from .config import config
+from .jobs import current_job
+
+_lock = threading.Lock()
+_by_job = OrderedDict()   # job id -> spans, newest jobs last
+MAX_JOBS = 200
+
+def trace_path(day: str = None) -> str:
+    """JSONL trace log for day (YYYY-MM-DD, default today)."""
+    day = day or time.strftime("%Y-%m-%d")
+    return os.path.join(config.cache_dir, "traces", f"{day}.jsonl")
+
+def record(stage: str, seconds: float, start: float = None, **attrs) -> dict:
+    """Record a finished span under the current job and append it to today's trace log."""
+    job = current_job()
+    rec = {
+        "ts": start if start is not None else time.time() - seconds,
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "job_id": job.id if job else None,
+        "job": job.name if job else None,
+    }
+    rec.update(attrs)
+    with _lock:
+        if job is not None:
+            _by_job.setdefault(job.id, []).append(rec)
+            _by_job.move_to_end(job.id)
+            while len(_by_job) > MAX_JOBS:
+                _by_job.popitem(last=False)
+        if config.trace_enabled:
+            try:
+                path = trace_path(time.strftime("%Y-%m-%d", time.localtime(rec["ts"])))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            except Exception:
+                pass
+    return rec
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Time the enclosed block as one span; the yielded dict can take extra
+    attributes (e.g. poll counts) before the span is recorded.
+    """
+    start, t0 = time.time(), time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record(stage, time.perf_counter() - t0, start, **attrs)
+
+def job_spans(job_id: int) -> list[dict]:
+    with _lock:
+        return list(_by_job.get(job_id, []))
+
+def job_breakdown(job_id: int) -> str:
+    """One line per stage for a job: total seconds, count and polls, in first-seen order."""
+    totals = OrderedDict()
+    for s in job_spans(job_id):
+        count, seconds, polls = totals.get(s["stage"], (0, 0.0, 0))
+        totals[s["stage"]] = (count + 1, seconds + s["seconds"], polls + s.get("polls", 0))
+    lines = []
+    for stage, (count, seconds, polls) in totals.items():
+        line = f"{stage:<20}{seconds:>8.2f}s"
+        if count > 1:
+            line += f"  ×{count}"
+        if polls:
+            line += f"  {polls} polls"
+        lines.append(line)
+    return "\n".join(lines)
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def summarize(day: str = None) -> dict:
+    """Per-stage count, p50, p95 and total seconds over one day's trace log."""
+    by_stage = {}
+    try:
+        with open(trace_path(day), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                by_stage.setdefault(rec["stage"], []).append(rec["seconds"])
+    except OSError:
+        return {}
+    return {
+        stage: {
+            "count": len(v),
+            "p50": round(_percentile(v, 0.5), 4),
+            "p95": round(_percentile(v, 0.95), 4),
+            "total": round(sum(v), 2),
+        }
+        for stage, v in sorted(by_stage.items(), key=lambda kv: -sum(kv[1]))
+    }
+
+def format_summary(summary: dict) -> str:
+    lines = [f"{'stage':<22}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'total s':>10}"]
+    for stage, s in summary.items():
+        lines.append(f"{stage:<22}{s['count']:>7}{s['p50']:>9.3f}{s['p95']:>9.3f}{s['total']:>10.1f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    # python -m ui.tracing [YYYY-MM-DD]
+    day = sys.argv[1] if len(sys.argv) > 1 else None
+    summary = summarize(day)
+    print(format_summary(summary) if summary else f"No spans in {trace_path(day)}")
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from openai import NotFoundError
+
+from .config import config
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def key_namespace(api_key: str) -> str:
+    """File IDs are only valid for the account that uploaded them."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+class UploadCache:
+    """
+    Persistent map of file content hash -> remote OpenAI file_id.
+    """
+    def __init__(self, path: str, max_age_days: float = 30):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._validated = set()
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+        except Exception:
+            self._entries = {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def get(self, api_key: str, sha: str):
+        with self._lock:
+            entry = self._entries.get(key_namespace(api_key), {}).get(sha)
+        if not entry:
+            return None
+        expires_at = entry.get("expires_at")
+        if expires_at and expires_at <= time.time():
+            self.evict(api_key, sha)
+            return None
+        if self.max_age and time.time() - entry.get("uploaded_at", 0) > self.max_age:
+            self.evict(api_key, sha)
+            return None
+        return entry
+
+    def put(self, api_key: str, sha: str, file_id: str, filename: str, expires_at=None):
+        with self._lock:
+            self._entries.setdefault(key_namespace(api_key), {})[sha] = {
+                "file_id": file_id,
+                "filename": filename,
+                "uploaded_at": time.time(),
+                "expires_at": expires_at,
+            }
+            self._validated.add(file_id)
+            self._save()
+
+    def evict(self, api_key: str, sha: str):
+        with self._lock:
+            entry = self._entries.get(key_namespace(api_key), {}).pop(sha, None)
+            if entry:
+                self._validated.discard(entry["file_id"])
+                self._save()
+
+    def evict_file_id(self, file_id: str):
+        """Drop every entry pointing at file_id (e.g. after a remote delete)."""
+        with self._lock:
+            changed = False
+            for entries in self._entries.values():
+                for sha in [s for s, e in entries.items() if e["file_id"] == file_id]:
+                    del entries[sha]
+                    changed = True
+            self._validated.discard(file_id)
+            if changed:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._validated.clear()
+            self._save()
+
+    def _is_alive(self, client, file_id: str) -> bool:
+        """
+        Check once per process that the remote file still exists. Only a
+        404 counts as deleted; on any other error the entry is kept and
+        checked again next time.
+        """
+        if file_id in self._validated:
+            return True
+        try:
+            remote = client.files.retrieve(file_id)
+        except NotFoundError:
+            return False
+        except Exception:
+            return True
+        if getattr(remote, "status", None) in ("error", "deleted"):
+            return False
+        expires_at = getattr(remote, "expires_at", None)
+        if expires_at and expires_at <= time.time():
+            return False
+        self._validated.add(file_id)
+        return True
+
+    def get_or_upload(self, client, api_key: str, pdf_path: str) -> str:
+        """
+        Return a file_id for pdf_path, uploading only if no live cached copy exists.
+        """
+        sha = file_sha256(pdf_path)
+        entry = self.get(api_key, sha)
+        if entry and self._is_alive(client, entry["file_id"]):
+            return entry["file_id"]
+        if entry:
+            self.evict(api_key, sha)
+
+        with open(pdf_path, "rb") as f:
+            up = client.files.create(file=f, purpose="assistants")
+        self.put(api_key, sha, up.id, os.path.basename(pdf_path),
+                 expires_at=getattr(up, "expires_at", None))
+        return up.id
+
+upload_cache = UploadCache(os.path.join(config.cache_dir, "uploads.json"))
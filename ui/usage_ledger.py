@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from .config import config
+from .jobs import current_job
+
+MAX_JOBS = 200
+
+class BudgetExceeded(RuntimeError):
+    """An analysis or chat would go over its per-job or per-day token budget."""
+
+def _usage_tokens(usage) -> tuple[int, int]:
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+def price(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost from config.token_prices (per 1M prompt/completion tokens)."""
+    prices = config.token_prices
+    rates = prices.get(model or "")
+    if rates is None:
+        # Dated snapshots (e.g. gpt-4o-2024-08-06) share their family's price
+        family = max((m for m in prices if model and model.startswith(m)), key=len, default="default")
+        rates = prices.get(family, [0.0, 0.0])
+    return (prompt_tokens * rates[0] + completion_tokens * rates[1]) / 1_000_000
+
+class UsageLedger:
+    """
+    Token and cost ledger: one JSONL file per day under directory with the
+    pre-estimate of each analysis or chat turn and the usage reported by
+    every completed run, keyed by job, file set and assistant. Keeps
+    running totals per day and per job for the budget checks.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._days = {}
+        self._jobs = OrderedDict()   # job id -> totals and the job's file set/assistant
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.directory, f"{day}.jsonl")
+
+    def _day(self, day: str) -> dict:
+        """Totals of day, read from its file the first time (caller holds the lock)."""
+        if day not in self._days:
+            totals = {"runs": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+            try:
+                with open(self._path(day), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            continue
+                        if rec.get("kind") == "run":
+                            totals["runs"] += 1
+                            totals["prompt_tokens"] += rec["prompt_tokens"]
+                            totals["completion_tokens"] += rec["completion_tokens"]
+                            totals["cost"] += rec["cost"]
+            except OSError:
+                pass
+            self._days[day] = totals
+        return self._days[day]
+
+    def _job(self, job) -> dict:
+        entry = self._jobs.get(job.id)
+        if entry is None:
+            entry = self._jobs[job.id] = {
+                "estimated_tokens": 0, "runs": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "cost": 0.0, "files": None, "assistant_id": None,
+                "routes": {},
+            }
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+        return entry
+
+    def _append(self, rec: dict):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(time.strftime("%Y-%m-%d", time.localtime(rec["ts"]))), "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        except Exception:
+            pass
+
+    def _base(self, job, **keys) -> dict:
+        rec = {"ts": time.time(), "job_id": job.id if job else None, "job": job.name if job else None}
+        rec.update(keys)
+        return rec
+
+    def today(self) -> dict:
+        with self._lock:
+            return dict(self._day(time.strftime("%Y-%m-%d")))
+
+    def job_totals(self, job_id: int):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return dict(entry, routes=dict(entry["routes"])) if entry else None
+
+    def check(self, estimated_tokens: int) -> str:
+        """
+        Return why an estimated batch would exceed the per-job or per-day
+        budget (config.budget_job_tokens / budget_day_tokens, 0 = none), or "".
+        """
+        job = current_job()
+        with self._lock:
+            day = self._day(time.strftime("%Y-%m-%d"))
+            spent_today = day["prompt_tokens"] + day["completion_tokens"]
+            entry = self._jobs.get(job.id) if job else None
+            spent_job = entry["prompt_tokens"] + entry["completion_tokens"] if entry else 0
+        if config.budget_job_tokens and spent_job + estimated_tokens > config.budget_job_tokens:
+            return (f"estimated {estimated_tokens:,} tokens exceeds the per-job budget of "
+                    f"{config.budget_job_tokens:,}")
+        if config.budget_day_tokens and spent_today + estimated_tokens > config.budget_day_tokens:
+            return (f"estimated {estimated_tokens:,} tokens would exceed today's budget of "
+                    f"{config.budget_day_tokens:,} ({spent_today:,} used)")
+        return ""
+
+    def check_job(self):
+        """Raise BudgetExceeded if the current job has already used its budget."""
+        job = current_job()
+        if job is None or not config.budget_job_tokens:
+            return
+        with self._lock:
+            entry = self._jobs.get(job.id)
+            spent = entry["prompt_tokens"] + entry["completion_tokens"] if entry else 0
+        if spent >= config.budget_job_tokens:
+            raise BudgetExceeded(f"{job.name} used {spent:,} tokens, its budget is {config.budget_job_tokens:,}")
+
+    def record_estimate(self, estimated_tokens: int, files: str, assistant_id: str, mode: str):
+        """
+        Log the pre-estimate of a batch (None if budgets are off and it was
+        not estimated) and key the current job's later runs to its file set.
+        """
+        job = current_job()
+        rec = self._base(job, kind="estimate", files=files, assistant_id=assistant_id,
+                         mode=mode, estimated_tokens=estimated_tokens)
+        with self._lock:
+            if job is not None:
+                entry = self._job(job)
+                entry["estimated_tokens"] += estimated_tokens or 0
+                entry["files"], entry["assistant_id"] = files, assistant_id
+            self._append(rec)
+
+    def record_run(self, run, task: str = None):
+        """
+        Log the usage reported by a finished run (no-op if it reports none)
+        with the task it was routed for; the job keeps the model used per task.
+        """
+        prompt_tokens, completion_tokens = _usage_tokens(getattr(run, "usage", None))
+        if not (prompt_tokens or completion_tokens):
+            return
+        job = current_job()
+        model = getattr(run, "model", None)
+        cost = price(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            entry = self._job(job) if job is not None else None
+            rec = self._base(
+                job, kind="run",
+                files=entry["files"] if entry else None,
+                assistant_id=getattr(run, "assistant_id", None),
+                run_id=getattr(run, "id", None), task=task, model=model,
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                cost=round(cost, 6),
+            )
+            day = self._day(time.strftime("%Y-%m-%d", time.localtime(rec["ts"])))
+            for totals in filter(None, (day, entry)):
+                totals["runs"] += 1
+                totals["prompt_tokens"] += prompt_tokens
+                totals["completion_tokens"] += completion_tokens
+                totals["cost"] += cost
+            if entry is not None and task:
+                entry["routes"][task] = model
+            self._append(rec)
+
+    def describe(self) -> str:
+        """One-line summary of today's usage for the UI."""
+        t = self.today()
+        used = t["prompt_tokens"] + t["completion_tokens"]
+        limit = f" / {config.budget_day_tokens:,}" if config.budget_day_tokens else ""
+        return f"Today: {used:,}{limit} tokens in {t['runs']} runs, ${t['cost']:.2f}"
+
+usage_ledger = UsageLedger(os.path.join(config.cache_dir, "usage"))
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+
+from .config import config
+from .upload_cache import file_sha256
+from .jobs import scheduler, PRIORITY_BACKGROUND
+from .batch import run_analysis, write_result
+
+RESULT_SUFFIX = ".analysis"
+
+def state_path_for(directory: str) -> str:
+    """Per-directory state file, so switching directories starts from a fresh baseline."""
+    digest = hashlib.sha256(os.path.abspath(directory).encode()).hexdigest()[:16]
+    return os.path.join(config.cache_dir, "watch", digest + ".json")
+
+class FolderWatcher:
+    """
+    Polls a directory tree for new PDFs and analyzes each one in the
+    background, writing <name>.analysis.json/.md next to the file.
+
+    A file is picked up once its size and mtime have been stable for
+    config.watch_settle_seconds; files whose content was seen before (by
+    SHA-256) are skipped. At most config.watch_workers analyses are queued
+    on the job scheduler at once. on_event(kind, path, detail) reports
+    "queued", "duplicate", "done" and "failed".
+    """
+    def __init__(self, directory: str, api_key: str, assistant_id: str,
+                 on_event=None, state_path: str = None):
+        self.directory = directory
+        self.api_key = api_key
+        self.assistant_id = assistant_id
+        self.on_event = on_event
+        self.state_path = state_path or state_path_for(directory)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._candidates = {}   # path -> (size, mtime) at the last scan
+        self._pending = deque()
+        self._jobs = {}         # job -> path
+        self._state = {"files": {}, "hashes": {}}
+        self._baseline = not self._load()
+        scheduler.add_listener(self._on_job_update)
+
+    def _load(self) -> bool:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+            return True
+        except Exception:
+            return False
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp, self.state_path)
+        except Exception:
+            pass
+
+    def _emit(self, kind: str, path: str, detail: str = ""):
+        if self.on_event:
+            try:
+                self.on_event(kind, path, detail)
+            except Exception:
+                pass
+
+    def _walk(self):
+        # The app's own files (prefilter bundles, service uploads) live under cache_dir
+        cache = os.path.abspath(config.cache_dir)
+        for root, dirs, names in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != cache]
+            if os.path.abspath(root) == cache or os.path.abspath(root).startswith(cache + os.sep):
+                continue
+            for name in names:
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, (st.st_size, st.st_mtime)
+
+    def scan_once(self):
+        """One polling pass: find settled new files, dedupe them and queue analyses."""
+        if self._baseline:
+            self._record_existing()
+            return
+        now = time.time()
+        seen = {}
+        ready = []
+        with self._lock:
+            for path, sig in self._walk():
+                seen[path] = sig
+                if self._state["files"].get(path) == list(sig):
+                    continue  # already handled in this exact version
+                settled = now - sig[1] >= config.watch_settle_seconds
+                if self._candidates.get(path) == sig and settled:
+                    ready.append((path, sig))
+            self._candidates = seen
+
+        for path, sig in ready:
+            try:
+                sha = file_sha256(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._state["files"][path] = list(sig)
+                original = self._state["hashes"].get(sha)
+                if original is None:
+                    self._state["hashes"][sha] = path
+                self._save()
+            if original is not None and original != path:
+                self._emit("duplicate", path, original)
+                continue
+            with self._lock:
+                self._pending.append(path)
+            self._emit("queued", path)
+        self._pump()
+
+    def _record_existing(self):
+        """First run: files already present are not new; remember them without analysis."""
+        for path, sig in self._walk():
+            try:
+                sha = file_sha256(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._state["files"][path] = list(sig)
+                self._state["hashes"].setdefault(sha, path)
+        with self._lock:
+            self._save()
+        self._baseline = False
+
+    def _pump(self):
+        with self._lock:
+            # Jobs cancelled from the Jobs panel free their slot too
+            self._jobs = {j: p for j, p in self._jobs.items() if j.state in ("queued", "running")}
+            while self._pending and len(self._jobs) < max(1, config.watch_workers):
+                path = self._pending.popleft()
+                job = scheduler.submit(
+                    lambda p=path: self._analyze(p),
+                    name=f"Watch: {os.path.basename(path)}",
+                    priority=PRIORITY_BACKGROUND
+                )
+                self._jobs[job] = path
+
+    def _analyze(self, path: str):
+        result = run_analysis("single", [path], self.api_key, self.assistant_id)
+        stem = os.path.splitext(os.path.basename(path))[0] + RESULT_SUFFIX
+        write_result(os.path.dirname(path), stem, result)
+        if result["error"]:
+            self._emit("failed", path, result["error"])
+        else:
+            self._emit("done", path, stem)
+        return result
+
+    def _on_job_update(self, job):
+        if job.state in ("done", "failed", "cancelled") and job in self._jobs:
+            if job.state == "cancelled":
+                # Not analyzed: forget it so the next scans pick the file up again
+                with self._lock:
+                    self._state["files"].pop(self._jobs[job], None)
+                    self._save()
+            self._pump()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.scan_once()
+            except Exception as e:
+                self._emit("failed", self.directory, str(e))
+            self._stop.wait(config.watch_interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        scheduler.remove_listener(self._on_job_update)